@@ -0,0 +1,159 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt import exceptions
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+TOKEN_CACHE_SIZE = getattr(settings, "AUTH_TOKEN_CACHE_SIZE", 1024)
+TOKEN_CACHE_TTL = getattr(settings, "AUTH_TOKEN_CACHE_TTL", 60)
+
+
+class AsyncJWTAuthentication(JWTAuthentication):
+    """
+    ``JWTAuthentication`` that can also authenticate native async views
+    through ``aauthenticate``: the token checks are CPU only and the user
+    is loaded with ``aget``.
+    """
+
+    async def aauthenticate(self, request):
+        raw_token = self.get_request_token(request)
+        if raw_token is None:
+            return None
+
+        validated_token = self.get_validated_token(raw_token)
+
+        return await self.aget_user(validated_token), validated_token
+
+    def get_request_token(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+        return self.get_raw_token(header)
+
+    def get_user_id(self, validated_token):
+        try:
+            return validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise exceptions.InvalidToken(
+                _("Token contained no recognizable user identification")
+            ) from e
+
+    async def aget_user(self, validated_token):
+        user_id = self.get_user_id(validated_token)
+        try:
+            user = await self.user_model.objects.aget(
+                **{api_settings.USER_ID_FIELD: user_id}
+            )
+        except self.user_model.DoesNotExist as e:
+            raise exceptions.AuthenticationFailed(
+                _("User not found"), code="user_not_found"
+            ) from e
+        self.check_user(user, validated_token)
+        return user
+
+    def check_user(self, user, validated_token) -> None:
+        """The checks ``JWTAuthentication.get_user`` runs on the user."""
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise exceptions.AuthenticationFailed(
+                _("User is inactive"), code="user_inactive"
+            )
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(
+                api_settings.REVOKE_TOKEN_CLAIM
+            ) != get_md5_hash_password(user.password):
+                raise exceptions.AuthenticationFailed(
+                    _("The user's password has been changed."),
+                    code="password_changed"
+                )
+
+
+class TokenCache:
+    """
+    Thread-safe LRU of ``raw token -> validated token``.
+
+    An entry lives for ``ttl`` seconds and never past the token's own
+    ``exp``, so an expired token is always rejected by simplejwt again.
+    The key is the whole raw token, signature included: only a token that
+    has already been verified once can hit.
+    """
+
+    def __init__(self, maxsize: int = TOKEN_CACHE_SIZE,
+                 ttl: float = TOKEN_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, raw_token: bytes):
+        with self._lock:
+            entry = self._entries.get(raw_token)
+            if entry is None:
+                return None
+            expires_at, validated_token = entry
+            if expires_at <= time.time():
+                del self._entries[raw_token]
+                return None
+            self._entries.move_to_end(raw_token)
+            return validated_token
+
+    def set(self, raw_token: bytes, validated_token) -> None:
+        if self.maxsize <= 0:
+            return
+        expires_at = time.time() + self.ttl
+        exp = validated_token.get("exp")
+        if exp is not None:
+            expires_at = min(expires_at, exp)
+        with self._lock:
+            self._entries[raw_token] = (expires_at, validated_token)
+            self._entries.move_to_end(raw_token)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+token_cache = TokenCache()
+
+
+class CachedJWTAuthentication(AsyncJWTAuthentication):
+    """
+    ``AsyncJWTAuthentication`` that skips decoding and verifying tokens
+    seen recently, see ``TokenCache``.
+
+    Only the token is cached: the user is loaded and checked (active,
+    password not changed since the token was issued) on every request,
+    so deactivating a user or changing their password takes effect at
+    once, in every process.
+    """
+
+    def validated_token(self, raw_token: bytes):
+        validated_token = token_cache.get(raw_token)
+        if validated_token is None:
+            validated_token = self.get_validated_token(raw_token)
+            token_cache.set(raw_token, validated_token)
+        return validated_token
+
+    def authenticate(self, request):
+        raw_token = self.get_request_token(request)
+        if raw_token is None:
+            return None
+        validated_token = self.validated_token(raw_token)
+        return self.get_user(validated_token), validated_token
+
+    async def aauthenticate(self, request):
+        raw_token = self.get_request_token(request)
+        if raw_token is None:
+            return None
+        validated_token = self.validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
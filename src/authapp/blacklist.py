@@ -0,0 +1,148 @@
+import threading
+import time
+
+from django.conf import settings
+from django.db.models import Max, Q
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from rest_framework_simplejwt.utils import aware_utcnow
+
+SYNC_INTERVAL = getattr(settings, "AUTH_BLACKLIST_SYNC_INTERVAL", 10)
+RELOAD_INTERVAL = getattr(settings, "AUTH_BLACKLIST_RELOAD_INTERVAL", 3600)
+GAP_TIMEOUT = 60
+GAP_WINDOW = 100
+MAX_GAPS = 1000
+PRUNE_INTERVAL = 60
+
+
+class BlacklistIndex:
+    """
+    In-process set of the blacklisted JTIs that have not expired yet, as
+    ``jti -> exp``; expired tokens are rejected by simplejwt anyway, so
+    its size is bounded by the logouts within one refresh lifetime, not
+    by the blacklist table.
+
+    The index is loaded on first use and then follows the table through
+    ``BlacklistedToken.id``: ``sync`` fetches only the rows past the
+    highest id seen, a primary key range that stays flat as the table
+    grows. Ids are not committed in order, so ids below the high-water
+    mark that were not there yet are kept as gaps and fetched again for
+    ``GAP_TIMEOUT`` seconds: those skipped by a sync and, on load, those
+    missing among the last ``GAP_WINDOW`` ids. Every
+    ``AUTH_BLACKLIST_RELOAD_INTERVAL`` seconds the unexpired rows are
+    reloaded in full, which catches anything committed later still.
+
+    Blacklisting in this process takes effect at once. Blacklisting in
+    another process is seen on the next sync, at most
+    ``AUTH_BLACKLIST_SYNC_INTERVAL`` seconds later: a deliberate
+    trade-off, a logged out refresh token stays usable elsewhere for up
+    to that long so that refreshes do not query the table every time.
+    Set it to ``0`` to sync on every check.
+    """
+
+    def __init__(
+            self,
+            sync_interval: float = SYNC_INTERVAL,
+            reload_interval: float = RELOAD_INTERVAL,
+         ):
+        self.sync_interval = sync_interval
+        self.reload_interval = reload_interval
+        self._expiry = {}
+        self._gaps = {}
+        self._last_id = None
+        self._loaded_at = 0.0
+        self._synced_at = 0.0
+        self._pruned_at = 0.0
+        self._lock = threading.Lock()
+
+    def is_blacklisted(self, jti: str) -> bool:
+        now = time.time()
+        if (self._last_id is None
+                or now - self._synced_at >= self.sync_interval):
+            self.sync()
+        exp = self._expiry.get(jti)
+        return exp is not None and exp > now
+
+    def sync(self) -> None:
+        with self._lock:
+            now = time.time()
+            if (self._last_id is None
+                    or now - self._loaded_at >= self.reload_interval):
+                self._load(now)
+            else:
+                self._follow(now)
+            self._synced_at = now
+            if now - self._pruned_at >= PRUNE_INTERVAL:
+                self._prune(now)
+
+    def _load(self, now: float) -> None:
+        # Only rows still worth remembering, plus every row of the last
+        # GAP_WINDOW ids so that ids missing there can be told apart from
+        # expired ones; the id high-water mark comes from the whole table.
+        last_id = BlacklistedToken.objects.aggregate(
+            last=Max("id")
+        )["last"] or 0
+        window = max(last_id - GAP_WINDOW, 0)
+        ids = set(self._read(BlacklistedToken.objects.filter(
+            Q(token__expires_at__gt=aware_utcnow()) | Q(id__gt=window),
+            id__lte=last_id,
+        )))
+        self._last_id = last_id
+        self._gaps = {
+            pk: now for pk in range(window + 1, last_id) if pk not in ids
+        }
+        self._loaded_at = now
+
+    def _follow(self, now: float) -> None:
+        self._gaps = {
+            pk: seen for pk, seen in self._gaps.items()
+            if now - seen < GAP_TIMEOUT
+        }
+        rows = Q(id__gt=self._last_id)
+        if self._gaps:
+            rows |= Q(id__in=list(self._gaps))
+        ids = self._read(BlacklistedToken.objects.filter(rows))
+        for pk in ids:
+            self._gaps.pop(pk, None)
+        if ids and max(ids) > self._last_id:
+            seen = set(ids)
+            for pk in range(self._last_id + 1, max(ids)):
+                if pk not in seen:
+                    self._gaps[pk] = now
+            self._last_id = max(ids)
+        if len(self._gaps) > MAX_GAPS:
+            # Too many to fetch by id; reload on the next sync instead.
+            self._loaded_at = 0.0
+
+    def _read(self, rows) -> list[int]:
+        ids = []
+        for pk, jti, expires_at in rows.values_list(
+            "id",
+            "token__jti",
+            "token__expires_at",
+        ).iterator():
+            self._expiry[jti] = expires_at.timestamp()
+            ids.append(pk)
+        return ids
+
+    def add(self, jti: str, exp: float) -> None:
+        with self._lock:
+            self._expiry[jti] = exp
+
+    def clear(self) -> None:
+        """Forget everything; the next check reloads from the table."""
+        with self._lock:
+            self._expiry.clear()
+            self._gaps.clear()
+            self._last_id = None
+
+    def _prune(self, now: float) -> None:
+        expired = [jti for jti, exp in self._expiry.items() if exp <= now]
+        for jti in expired:
+            del self._expiry[jti]
+        self._pruned_at = now
+
+    def __len__(self) -> int:
+        return len(self._expiry)
+
+
+blacklist_index = BlacklistIndex()
@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+from rest_framework_simplejwt.utils import aware_utcnow
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete expired outstanding tokens, and with them their blacklist "
+        "entries, in bounded batches. Run it on a schedule (e.g. daily "
+        "from cron) to keep the token tables small."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Rows deleted per batch (default 1000)",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        if batch_size < 1:
+            raise CommandError("--batch-size must be a positive integer.")
+
+        now = aware_utcnow()
+        purged = 0
+        last_id = 0
+        while True:
+            # expires_at is not indexed; tokens expire in id order (one
+            # lifetime for all), so walk the primary key from the oldest
+            # and stop at the first short batch.
+            ids = list(
+                OutstandingToken.objects.filter(
+                    id__gt=last_id,
+                    expires_at__lte=now,
+                ).order_by("id").values_list("id", flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            OutstandingToken.objects.filter(id__in=ids).delete()
+            purged += len(ids)
+            last_id = ids[-1]
+            if len(ids) < batch_size:
+                break
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Purged {purged} expired tokens.")
+        )
@@ -1,5 +1,8 @@
 from django.contrib.auth import authenticate, get_user_model
 from rest_framework import serializers
+from rest_framework_simplejwt import serializers as jwt_serializers
+
+from .tokens import RefreshToken
 
 User = get_user_model()
 
@@ -39,3 +42,7 @@ class LoginSerializer(serializers.Serializer):
 class TokenSerializer(serializers.Serializer):
     access_token = serializers.CharField()
     refresh_token = serializers.CharField()
+
+
+class TokenRefreshSerializer(jwt_serializers.TokenRefreshSerializer):
+    token_class = RefreshToken
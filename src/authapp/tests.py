@@ -0,0 +1,182 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt import tokens
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist import models as jwt_blacklist
+from rest_framework_simplejwt.tokens import AccessToken
+
+from core.testing import LOCMEM_CACHES
+
+from .authentication import CachedJWTAuthentication, token_cache
+from .blacklist import BlacklistIndex, blacklist_index
+from .tokens import RefreshToken
+
+User = get_user_model()
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class CachedJWTAuthenticationTests(TestCase):
+    def setUp(self):
+        token_cache.clear()
+        self.addCleanup(token_cache.clear)
+        self.user = User.objects.create_user("cached", password="secret")
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}"
+        )
+
+    def list_events(self):
+        return self.client.get("/api/events", {"page_size": 1})
+
+    def test_repeated_requests_skip_token_validation(self):
+        self.assertEqual(self.list_events().status_code, 200)
+        self.assertEqual(len(token_cache), 1)
+        with mock.patch.object(
+            CachedJWTAuthentication,
+            "get_validated_token",
+        ) as get_validated_token:
+            # The user lookup; the page itself is cached.
+            with self.assertNumQueries(1):
+                self.assertEqual(self.list_events().status_code, 200)
+        get_validated_token.assert_not_called()
+
+    def test_deactivated_user_is_rejected_at_once(self):
+        self.assertEqual(self.list_events().status_code, 200)
+        # A queryset update, as another process or the shell would do.
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertEqual(self.list_events().status_code, 401)
+
+    def test_password_change_revokes_cached_tokens(self):
+        # simplejwt modules hold api_settings itself; override_settings
+        # would replace it only in rest_framework_simplejwt.settings.
+        with mock.patch.object(api_settings, "CHECK_REVOKE_TOKEN", True):
+            self.client.credentials(
+                HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}"
+            )
+            self.assertEqual(self.list_events().status_code, 200)
+            User.objects.filter(pk=self.user.pk).update(
+                password=make_password("changed")
+            )
+            response = self.list_events()
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.data["code"], "password_changed")
+
+
+class BlacklistTests(TestCase):
+    def setUp(self):
+        blacklist_index.clear()
+        self.addCleanup(blacklist_index.clear)
+        self.client = APIClient()
+        response = self.client.post(
+            "/api/auth/register",
+            {"username": "leaving", "password": "secret-password"},
+            format="json",
+        )
+        self.access = response.data["access_token"]
+        self.refresh = response.data["refresh_token"]
+
+    def refresh_token(self):
+        return self.client.post(
+            "/api/auth/token/refresh",
+            {"refresh": self.refresh},
+            format="json",
+        )
+
+    def test_refresh_does_not_query_the_blacklist(self):
+        self.assertEqual(self.refresh_token().status_code, 200)
+        # Only the user lookup; the index synced on the first refresh.
+        with self.assertNumQueries(1):
+            self.assertEqual(self.refresh_token().status_code, 200)
+        with mock.patch.object(blacklist_index, "sync_interval", 0):
+            # The index sync (a primary key range) and the user lookup.
+            with self.assertNumQueries(2):
+                self.assertEqual(self.refresh_token().status_code, 200)
+
+    def test_logout_blacklists_the_refresh_token(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.access}")
+        response = self.client.post(
+            "/api/auth/logout",
+            {"refresh": self.refresh},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.refresh_token().status_code, 401)
+
+    def test_index_sees_tokens_blacklisted_elsewhere(self):
+        self.refresh_token()
+        # Bypasses this process's index, as another worker would.
+        tokens.RefreshToken(self.refresh).blacklist()
+        self.assertEqual(self.refresh_token().status_code, 200)
+        with mock.patch.object(blacklist_index, "sync_interval", 0):
+            self.assertEqual(self.refresh_token().status_code, 401)
+
+    def blacklist_with_id(self, pk):
+        token = tokens.RefreshToken(self.refresh)
+        outstanding = jwt_blacklist.OutstandingToken.objects.create(
+            jti=f"jti-{pk}",
+            token=str(token),
+            expires_at=timezone.now() + timedelta(days=1),
+        )
+        jwt_blacklist.BlacklistedToken.objects.create(id=pk, token=outstanding)
+        return outstanding.jti
+
+    def test_index_sees_ids_committed_out_of_order(self):
+        self.blacklist_with_id(99)
+        index = BlacklistIndex(sync_interval=0)
+        index.sync()
+        late = self.blacklist_with_id(100)
+        later = self.blacklist_with_id(103)
+        index.sync()
+        self.assertTrue(index.is_blacklisted(late))
+        self.assertTrue(index.is_blacklisted(later))
+        # 101 and 102 were still uncommitted when 103 was read.
+        self.assertIn(101, index._gaps)
+        self.assertIn(102, index._gaps)
+        gap = self.blacklist_with_id(101)
+        self.assertTrue(index.is_blacklisted(gap))
+        self.assertNotIn(101, index._gaps)
+        self.assertIn(102, index._gaps)
+
+    def test_index_sees_ids_missing_when_it_loaded(self):
+        self.blacklist_with_id(99)
+        self.blacklist_with_id(101)
+        index = BlacklistIndex(sync_interval=0)
+        index.sync()
+        # 100 was still uncommitted when the index loaded.
+        self.assertIn(100, index._gaps)
+        self.assertNotIn(99, index._gaps)
+        gap = self.blacklist_with_id(100)
+        self.assertTrue(index.is_blacklisted(gap))
+        self.assertNotIn(100, index._gaps)
+
+    def test_reload_catches_ids_past_the_gap_timeout(self):
+        self.blacklist_with_id(99)
+        index = BlacklistIndex(sync_interval=0)
+        index.sync()
+        self.blacklist_with_id(100)
+        self.blacklist_with_id(103)
+        index.sync()
+        with mock.patch("authapp.blacklist.GAP_TIMEOUT", 0):
+            index.sync()
+        self.assertEqual(index._gaps, {})
+        gap = self.blacklist_with_id(101)
+        self.assertFalse(index.is_blacklisted(gap))
+        index.reload_interval = 0
+        self.assertTrue(index.is_blacklisted(gap))
+
+    def test_purge_deletes_expired_tokens_in_batches(self):
+        jwt_blacklist.OutstandingToken.objects.update(
+            expires_at=timezone.now() - timedelta(seconds=1)
+        )
+        RefreshToken(self.refresh).blacklist()
+        call_command("purge_expired_tokens", batch_size=1, stdout=StringIO())
+        self.assertFalse(jwt_blacklist.OutstandingToken.objects.exists())
+        self.assertFalse(jwt_blacklist.BlacklistedToken.objects.exists())
@@ -0,0 +1,27 @@
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt import tokens
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+
+from .blacklist import blacklist_index
+
+
+class RefreshToken(tokens.RefreshToken):
+    """
+    ``RefreshToken`` that checks the blacklist through ``blacklist_index``
+    instead of querying the blacklist tables on every refresh.
+    """
+
+    def check_blacklist(self) -> None:
+        if blacklist_index.is_blacklisted(
+            self.payload[api_settings.JTI_CLAIM]
+        ):
+            raise TokenError(_("Token is blacklisted"))
+
+    def blacklist(self):
+        result = super().blacklist()
+        blacklist_index.add(
+            self.payload[api_settings.JTI_CLAIM],
+            self.payload["exp"],
+        )
+        return result
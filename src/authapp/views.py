@@ -2,10 +2,11 @@ from django.contrib.auth import get_user_model
 from rest_framework import permissions, status
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework_simplejwt.tokens import RefreshToken, TokenError
+from rest_framework_simplejwt.tokens import TokenError
 from rest_framework_simplejwt.views import TokenRefreshView
 
 from .serializers import LoginSerializer, RegisterSerializer
+from .tokens import RefreshToken
 
 User = get_user_model()
 
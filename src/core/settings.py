@@ -1,3 +1,4 @@
+import os
 from datetime import timedelta
 from pathlib import Path
 
@@ -20,6 +21,11 @@ ALLOWED_HOSTS = []
 EVENTS_PROVIDER_API = "https://events.k3scluster.tech/api/events/"
 EVENTS_PROVIDER_TIMEOUT = 10
 EVENTS_PROVIDER_MAX_RETRIES = 3
+EVENTS_PROVIDER_POOL_SIZE = 10
+EVENTS_PROVIDER_COMPRESSION = True
+EVENTS_SYNC_BATCH_SIZE = 500
+EVENTS_PROVIDER_PREFETCH_PAGES = 4
+EVENTS_PROVIDER_STREAM = False
 EVENTS_PROVIDER_TOKEN = (
     "eyJhbGciOiJSUzI1NiIsInR5cCI6IkpXVCJ9."
     "eyJpc19zdGFmZiI6ZmFsc2UsInN1YiI6IjIxIiwiZXhwIjoxNzYzNDkwODA1LCJpYXQiOjE3"
@@ -30,6 +36,41 @@ EVENTS_PROVIDER_TOKEN = (
     "Fo5c37v9pbgtATTnyXtmbfhulAmbo_j3PIKLTNLAUtcCXJtxqJKloIs2WUmCDng"
 )
 
+NOTIFICATIONS_API_URL = (
+    "https://notifications.k3scluster.tech/api/notifications"
+)
+# POST endpoint taking a JSON list of emails, if the service offers one.
+# Without it every email is its own request and BATCH_SIZE/BATCH_WINDOW
+# are unused.
+NOTIFICATIONS_BATCH_URL = None
+NOTIFICATIONS_TOKEN = os.environ.get("NOTIFICATIONS_TOKEN", "")
+NOTIFICATIONS_OWNER_ID = os.environ.get(
+    "OWNER_ID",
+    "3fa85f64-5717-4562-b3fc-2c963f66afa7",
+)
+NOTIFICATIONS_CONNECT_TIMEOUT = 3.05
+NOTIFICATIONS_TIMEOUT = 5
+NOTIFICATIONS_BATCH_SIZE = 50
+NOTIFICATIONS_BATCH_WINDOW = 0.05
+
+OUTBOX_PUBLISHERS = {
+    "default": {"BACKEND": "outbox.publishers.ConsolePublisher"},
+    "notifications": {
+        "BACKEND": "events.notifications.ConfirmationEmailPublisher",
+    },
+}
+OUTBOX_ROUTES = {
+    "registration_confirmation": "notifications",
+}
+OUTBOX_MAX_IN_FLIGHT = 8
+OUTBOX_PARTITIONS = 64
+OUTBOX_LEASE_SECONDS = 60
+OUTBOX_MAX_ATTEMPTS = 10
+OUTBOX_RETRY_BASE_SECONDS = 5
+OUTBOX_RETRY_MAX_SECONDS = 3600
+OUTBOX_NOTIFY_CHANNEL = "outbox_messages"
+OUTBOX_ARCHIVE_DIR = BASE_DIR / "outbox_archive"
+
 # Application definition
 
 INSTALLED_APPS = [
@@ -43,6 +84,7 @@ INSTALLED_APPS = [
     "django_filters",
     "events",
     "rest_framework_simplejwt",
+    "rest_framework_simplejwt.token_blacklist",
     "authapp",
     "outbox",
     "syncapp.apps.SyncappConfig",
@@ -60,7 +102,7 @@ MIDDLEWARE = [
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "authapp.authentication.CachedJWTAuthentication",
     ),
     "DEFAULT_PERMISSION_CLASSES": (
         "rest_framework.permissions.IsAuthenticated",
@@ -85,8 +127,26 @@ SIMPLE_JWT = {
     "BLACKLIST_AFTER_ROTATION": True,
     "AUTH_HEADER_TYPES": ("Bearer",),
     "AUTH_TOKEN_CLASSES": ("rest_framework_simplejwt.tokens.AccessToken",),
+    "TOKEN_REFRESH_SERIALIZER": "authapp.serializers.TokenRefreshSerializer",
 }
 
+# Per-process cache of verified access tokens, see
+# authapp.authentication.CachedJWTAuthentication. Users are still loaded
+# and checked on every request.
+AUTH_TOKEN_CACHE_SIZE = 1024
+AUTH_TOKEN_CACHE_TTL = 60
+
+# Seconds between checks for tokens blacklisted by other processes, see
+# authapp.blacklist.BlacklistIndex. Deliberate trade-off: a refresh token
+# logged out in one process keeps working in the others for up to this
+# long, in exchange for refreshes that do not query the blacklist; 0
+# checks on every refresh.
+AUTH_BLACKLIST_SYNC_INTERVAL = 10
+
+# Seconds between full reloads of the unexpired blacklist, which pick up
+# rows committed out of id order after their gap has been given up on.
+AUTH_BLACKLIST_RELOAD_INTERVAL = 3600
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -106,6 +166,36 @@ TEMPLATES = [
 WSGI_APPLICATION = 'core.wsgi.application'
 
 
+# Cache
+# The event list cache must be shared by the web workers and the
+# sync_events command; the file-based backend does that on one host. Use
+# LocMemCache for a single-process setup.
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "events": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": BASE_DIR / "cache" / "events",
+        "TIMEOUT": 300,
+        # Bumping the version orphans every cached page instead of deleting
+        # it; orphans expire after TIMEOUT but their files stay until read
+        # or culled, so bound the directory (a culled version key is
+        # recreated from the clock and only invalidates the cache).
+        "OPTIONS": {"MAX_ENTRIES": 2000, "CULL_FREQUENCY": 4},
+    },
+}
+
+EVENTS_CACHE_ALIAS = "events"
+EVENTS_CACHE_TIMEOUT = 300
+
+# Serve the event list and registration through the native async views;
+# only worthwhile under ASGI (core.asgi), under WSGI every request would
+# pay for an event loop.
+EVENTS_ASYNC_VIEWS = False
+
+
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
@@ -0,0 +1,96 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.conf import settings
+
+# Every configured cache as its own LocMemCache, for
+# ``override_settings(CACHES=...)``: tests must not read or wipe the
+# file based caches of a development checkout.
+LOCMEM_CACHES = {
+    alias: {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": f"test-{alias}",
+    }
+    for alias in settings.CACHES
+}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """
+    Request handler for ``StubServer``; subclasses add ``do_GET`` or
+    ``do_POST`` and reach their server as ``self.stub``.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def stub(self) -> "StubServer":
+        return self.server.stub
+
+    def read_json(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length))
+
+    def reply(self, status: int, body: bytes = b""):
+        self.send_response(status)
+        if body:
+            self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubServer:
+    """
+    Local HTTP server on a free port, run in a daemon thread, for tests.
+
+    Subclasses set ``handler_class`` and ``path``; ``url`` points at
+    ``path`` on the running server. Handlers record what they received
+    with ``record``, read back from ``requests``. Use as a context
+    manager, or call ``start`` and ``stop``.
+    """
+
+    handler_class = StubHandler
+    path = "/"
+    name = "stub"
+
+    def __init__(self):
+        self.requests = []
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(
+            ("127.0.0.1", 0),
+            self.handler_class,
+        )
+        self.server.daemon_threads = True
+        self.server.stub = self
+        host, port = self.server.server_address
+        self.origin = f"http://{host}:{port}"
+        self.url = f"{self.origin}{self.path}"
+        self._thread = None
+
+    def record(self, entry) -> None:
+        with self._lock:
+            self.requests.append(entry)
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self.server.serve_forever,
+            name=self.name,
+            daemon=True,
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
@@ -0,0 +1,227 @@
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework import exceptions, filters, permissions, status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.views import exception_handler
+
+from . import cache, search, views
+from .models import Event
+from .pagination import AsyncPageNumberPagination, EventKeysetPagination
+from .registrations import register
+from .serializers import EventRegistrationSerializer
+
+
+class AsyncAPIView(View):
+    """
+    The parts of ``APIView`` the async event views need, run on the event
+    loop: request parsing, authentication (``aauthenticate`` where the
+    authenticator has it), permission checks and DRF's exception
+    handling. Responses are always rendered as JSON.
+    """
+
+    authentication_classes = api_settings.DEFAULT_AUTHENTICATION_CLASSES
+    permission_classes = api_settings.DEFAULT_PERMISSION_CLASSES
+    parser_classes = api_settings.DEFAULT_PARSER_CLASSES
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        # Authentication is token based, as in APIView.
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def dispatch(self, request, *args, **kwargs):
+        request = Request(
+            request,
+            parsers=[parser() for parser in self.parser_classes],
+        )
+        self.request = request
+        try:
+            await self.perform_authentication(request)
+            self.check_permissions(request)
+            method = request.method.lower()
+            if method not in self.http_method_names or not hasattr(
+                self,
+                method
+            ):
+                raise exceptions.MethodNotAllowed(request.method)
+            response = await getattr(self, method)(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+        return self.render(response)
+
+    def get_authenticators(self):
+        return [auth() for auth in self.authentication_classes]
+
+    async def perform_authentication(self, request) -> None:
+        self.authenticators = self.get_authenticators()
+        for authenticator in self.authenticators:
+            if hasattr(authenticator, "aauthenticate"):
+                user_auth = await authenticator.aauthenticate(request)
+            else:
+                user_auth = await sync_to_async(authenticator.authenticate)(
+                    request
+                )
+            if user_auth is not None:
+                request._authenticator = authenticator
+                request.user, request.auth = user_auth
+                return
+        request._authenticator = None
+        request.user = api_settings.UNAUTHENTICATED_USER()
+        request.auth = None
+
+    def check_permissions(self, request) -> None:
+        for permission in self.permission_classes:
+            if not permission().has_permission(request, self):
+                if self.authenticators and not request._authenticator:
+                    raise exceptions.NotAuthenticated()
+                raise exceptions.PermissionDenied()
+
+    def handle_exception(self, exc) -> Response:
+        if isinstance(
+            exc,
+            (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)
+        ):
+            if self.authenticators:
+                exc.auth_header = self.authenticators[0].authenticate_header(
+                    self.request
+                )
+            else:
+                exc.status_code = status.HTTP_403_FORBIDDEN
+        response = exception_handler(
+            exc,
+            {"view": self, "request": self.request},
+        )
+        if response is None:
+            raise exc
+        return response
+
+    def render(self, response):
+        if not isinstance(response, Response):
+            return response
+        content = b""
+        if response.data is not None:
+            content = JSONRenderer().render(response.data)
+        rendered = HttpResponse(
+            content,
+            status=response.status_code,
+            content_type=JSONRenderer.media_type,
+        )
+        # An unrendered Response still carries HttpResponse's default
+        # text/html Content-Type.
+        for header, value in response.items():
+            if header.lower() != "content-type":
+                rendered[header] = value
+        return rendered
+
+
+class AsyncEventListView(AsyncAPIView):
+    """
+    ``EventListAPIView`` on the async ORM: same filters, pagination,
+    cache and conditional responses, with the page read through
+    ``aiterator()`` and the cache through its async API.
+    """
+
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    search_fields = views.EventListAPIView.search_fields
+    ordering_fields = views.EventListAPIView.ordering_fields
+    ordering = views.EventListAPIView.ordering
+    get_queryset = views.EventListAPIView.get_queryset
+
+    def get_paginator(self, request):
+        if EventKeysetPagination.requested(request):
+            return EventKeysetPagination()
+        return AsyncPageNumberPagination()
+
+    async def filter_queryset(self, request, queryset):
+        for backend in self.filter_backends:
+            queryset = backend().filter_queryset(request, queryset, self)
+        search_filter = search.EventSearchFilter()
+        query = request.query_params.get(search_filter.search_param, "")
+        if search.search_terms(query):
+            available = await sync_to_async(search.is_available)(queryset.db)
+            queryset = search_filter.rank(
+                request,
+                search.search_events(queryset, query, available),
+            )
+        return queryset
+
+    async def lean_list(self, request):
+        serializer = views.lean_event_serializer()
+        queryset = serializer.values(
+            await self.filter_queryset(request, self.get_queryset())
+        )
+        paginator = self.get_paginator(request)
+        page = await paginator.apaginate_queryset(queryset, request, self)
+        if page is not None:
+            return paginator.get_paginated_response(serializer.many(page)).data
+        return serializer.many([row async for row in queryset.aiterator()])
+
+    async def get(self, request):
+        version = await cache.aget_events_version()
+        key = cache.list_cache_key(request, version)
+        entry = await cache.aget_cached_list(key)
+        cache_status = "HIT"
+        if entry is None:
+            cache_status = "MISS"
+            data = await self.lean_list(request)
+            entry = views.list_cache_entry(data, version)
+            await cache.aset_cached_list(key, entry)
+
+        response = get_conditional_response(
+            request._request,
+            etag=entry["etag"],
+            last_modified=entry["last_modified"],
+        )
+        if response is None:
+            response = views.list_content_response(entry)
+        return views.finalize_list_response(response, entry, cache_status)
+
+
+class AsyncEventRegisterView(AsyncAPIView):
+    """
+    ``EventRegisterAPIView`` for ASGI. The event is loaded with ``aget``;
+    the registration and its outbox message are written by ``register``
+    in a worker thread, since the async ORM cannot open a transaction.
+    The confirmation email itself is sent by the outbox relay.
+    """
+
+    permission_classes = [permissions.AllowAny]
+
+    async def post(self, request, event_id):
+        try:
+            event = await Event.objects.only("id", "name", "status").aget(
+                id=event_id
+            )
+        except Event.DoesNotExist:
+            raise exceptions.NotFound()
+
+        serializer = EventRegistrationSerializer(
+            data=request.data, context={"event": event}
+        )
+        serializer.is_valid(raise_exception=True)
+
+        registration = await sync_to_async(register)(
+            event,
+            serializer.validated_data["full_name"],
+            serializer.validated_data["email"],
+        )
+        if registration is None:
+            return Response(
+                {
+                    api_settings.NON_FIELD_ERRORS_KEY: [
+                        views.DUPLICATE_REGISTRATION
+                    ]
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        return Response(
+            {"message": views.REGISTERED},
+            status=status.HTTP_201_CREATED,
+        )
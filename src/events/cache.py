@@ -0,0 +1,118 @@
+import hashlib
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+CACHE_ALIAS = getattr(settings, "EVENTS_CACHE_ALIAS", "default")
+CACHE_TIMEOUT = getattr(settings, "EVENTS_CACHE_TIMEOUT", 300)
+LIST_QUERY_PARAMS = (
+    "search",
+    "ordering",
+    "page",
+    "page_size",
+    "pagination",
+    "cursor",
+)
+
+VERSION_KEY = "events:version"
+
+# Hit/miss counters of this process. Counting in the cache itself would
+# turn every hit into a write on the file based backend.
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def _cache():
+    return caches[CACHE_ALIAS]
+
+
+def get_events_version() -> int:
+    """
+    Current version of the event list, in nanoseconds since the epoch.
+
+    A missing version (first start, eviction) is recreated from the clock,
+    so it can only move forward and never resurrects stale entries.
+    """
+    cache = _cache()
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+async def aget_events_version() -> int:
+    cache = _cache()
+    version = await cache.aget(VERSION_KEY)
+    if version is None:
+        await cache.aadd(VERSION_KEY, time.time_ns(), timeout=None)
+        version = await cache.aget(VERSION_KEY)
+    return version
+
+
+def bump_events_version() -> None:
+    """
+    Invalidate every cached event list once the current transaction
+    commits.
+    """
+    transaction.on_commit(_bump)
+
+
+def _bump() -> None:
+    cache = _cache()
+    version = max(time.time_ns(), (cache.get(VERSION_KEY) or 0) + 1)
+    cache.set(VERSION_KEY, version, timeout=None)
+
+
+def version_last_modified(version: int) -> datetime:
+    return datetime.fromtimestamp(version // 10**9, tz=timezone.utc)
+
+
+def list_cache_key(request, version: int) -> str:
+    params = sorted(
+        (key, value)
+        for key in LIST_QUERY_PARAMS
+        for value in request.query_params.getlist(key)
+    )
+    query = "&".join(f"{key}={value}" for key, value in params)
+    digest = hashlib.md5(
+        f"{request.scheme}://{request.get_host()}?{query}".encode(),
+        usedforsecurity=False,
+    ).hexdigest()
+    return f"events:page:{version}:{digest}"
+
+
+def get_cached_list(key: str):
+    entry = _cache().get(key)
+    _count(entry)
+    return entry
+
+
+async def aget_cached_list(key: str):
+    entry = await _cache().aget(key)
+    _count(entry)
+    return entry
+
+
+def set_cached_list(key: str, entry: dict) -> None:
+    _cache().set(key, entry, timeout=CACHE_TIMEOUT)
+
+
+async def aset_cached_list(key: str, entry: dict) -> None:
+    await _cache().aset(key, entry, timeout=CACHE_TIMEOUT)
+
+
+def _count(entry) -> None:
+    with _stats_lock:
+        _stats["hits" if entry is not None else "misses"] += 1
+
+
+def cache_stats() -> dict:
+    """Event list cache hits and misses served by this process."""
+    with _stats_lock:
+        return {"hits": _stats["hits"], "misses": _stats["misses"]}
@@ -0,0 +1,175 @@
+import re
+import uuid
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from events.models import Event
+from events.search import search_events
+
+# Full scans of a real table. SQLite reports "SCAN <table>" (a
+# virtual-table scan is fine); PostgreSQL reports "Seq Scan on <table>".
+SEQ_SCAN_PATTERNS = {
+    "sqlite": re.compile(r"\bSCAN (\w+)$", re.MULTILINE),
+    "postgresql": re.compile(r"\bSeq Scan on (\w+)"),
+}
+# Walks of a whole index, as costly as a full scan once the table has
+# grown. SQLite reports "SCAN <table> USING [COVERING] INDEX <index>";
+# on PostgreSQL it is an index scan without an "Index Cond".
+INDEX_WALK_PATTERNS = {
+    "sqlite": re.compile(
+        r"\bSCAN (\w+) USING (?:COVERING )?INDEX \w+$",
+        re.MULTILINE,
+    ),
+    "postgresql": re.compile(
+        r"\bIndex (?:Only )?Scan (?:Backward )?using \w+ on (\w+)"
+    ),
+}
+# Queries whose plan walks more rows than the audit can see, with why.
+KNOWN_FULL_WALKS = {
+    "sqlite": {
+        "list search": (
+            "walks the open events in event_time order and checks each "
+            "one against the FTS match"
+        ),
+    },
+}
+SORT_PATTERNS = {
+    "sqlite": re.compile(r"USE TEMP B-TREE FOR (?:RIGHT PART OF )?ORDER BY"),
+    "postgresql": re.compile(r"\bSort\b"),
+}
+
+
+def canonical_queries(page_size: int = 10) -> dict:
+    """
+    The queries ``/api/events`` and ``EventAdmin`` issue, keyed by name.
+    """
+    now = timezone.now()
+    listed = (
+        Event.objects
+        .filter(status=Event.Status.OPEN)
+        .select_related("venue")
+    )
+    return {
+        "list page": listed.order_by("event_time")[:page_size],
+        "list count": listed.order_by().values("pk"),
+        "list keyset page": listed.filter(
+            Q(event_time__gte=now),
+            Q(event_time__gt=now) | Q(id__gt=uuid.UUID(int=0)),
+        ).order_by("event_time", "id")[:page_size + 1],
+        "list search": search_events(listed, "conc")[:page_size],
+        "admin status filter": Event.objects.filter(
+            status=Event.Status.CLOSED
+        ).order_by("-event_time")[:100],
+        "admin date filter": Event.objects.filter(
+            event_time__gte=now,
+            event_time__lt=now + timedelta(days=7),
+        ).order_by("-event_time")[:100],
+        "admin venue filter": Event.objects.filter(
+            venue_id=uuid.UUID(int=0)
+        ).order_by("-event_time")[:100],
+    }
+
+
+def index_walks(plan: str, vendor: str) -> list[str]:
+    """Tables whose index is walked end to end in ``plan``."""
+    pattern = INDEX_WALK_PATTERNS[vendor]
+    if vendor != "postgresql":
+        return pattern.findall(plan)
+    walks = []
+    lines = plan.splitlines()
+    for number, line in enumerate(lines):
+        match = pattern.search(line)
+        if match is None:
+            continue
+        # The node's own details are the following lines up to the next
+        # node ("->") or the end of its parent.
+        depth = len(line) - len(line.lstrip(" ->"))
+        details = []
+        for detail in lines[number + 1:]:
+            stripped = detail.lstrip()
+            if (
+                stripped.startswith("->")
+                or len(detail) - len(stripped) < depth
+            ):
+                break
+            details.append(stripped)
+        if not any(d.startswith("Index Cond:") for d in details):
+            walks.append(match.group(1))
+    return walks
+
+
+class Command(BaseCommand):
+    help = (
+        "EXPLAIN the canonical event list, search and admin filter queries "
+        "and fail if any of them falls back to a sequential scan or a full "
+        "index walk."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--database",
+            default="default",
+            help="Database alias to explain against (default 'default')",
+        )
+        parser.add_argument(
+            "--verbose-plans",
+            action="store_true",
+            help="Print the full plan of every query",
+        )
+
+    def handle(self, *args, **options):
+        using = options["database"]
+        vendor = connections[using].vendor
+        if vendor not in SEQ_SCAN_PATTERNS:
+            raise CommandError(f"Unsupported database vendor: {vendor}")
+
+        known = KNOWN_FULL_WALKS.get(vendor, {})
+        flagged = []
+        for name, queryset in canonical_queries().items():
+            plan = self.explain(queryset.using(using), vendor)
+            scans = SEQ_SCAN_PATTERNS[vendor].findall(plan)
+            walks = index_walks(plan, vendor)
+            sorts = SORT_PATTERNS[vendor].search(plan)
+            if scans:
+                flagged.append(name)
+                status = self.style.ERROR(
+                    f"SEQ SCAN on {', '.join(sorted(set(scans)))}"
+                )
+            elif walks:
+                flagged.append(name)
+                status = self.style.ERROR(
+                    f"FULL INDEX WALK on {', '.join(sorted(set(walks)))}"
+                )
+            elif name in known:
+                status = self.style.WARNING(f"known full walk: {known[name]}")
+            elif sorts:
+                status = self.style.WARNING("ok (explicit sort)")
+            else:
+                status = self.style.SUCCESS("ok")
+            self.stdout.write(f"{name}: {status}")
+            if options["verbose_plans"] or scans or walks:
+                for line in plan.splitlines():
+                    self.stdout.write(f"    {line}")
+
+        if flagged:
+            raise CommandError(
+                f"Sequential scans or full index walks in: "
+                f"{', '.join(flagged)}"
+            )
+        self.stdout.write(
+            self.style.SUCCESS("No sequential scans or full index walks.")
+        )
+
+    def explain(self, queryset, vendor: str) -> str:
+        if vendor != "postgresql":
+            return queryset.explain()
+        # Small tables are cheaper to scan; disable seq scans to see the
+        # plan the query gets once the table has grown.
+        with transaction.atomic(using=queryset.db):
+            with connections[queryset.db].cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+            return queryset.explain()
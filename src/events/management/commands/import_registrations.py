@@ -0,0 +1,95 @@
+import json
+import sys
+from collections import Counter
+from pathlib import Path
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from events import registrations
+from events.models import Event
+
+
+class Command(BaseCommand):
+    help = (
+        "Register attendees for an event from a CSV (full_name,email "
+        "header) or JSON Lines file and write one JSON result per row."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("event_id", type=str, help="Event UUID")
+        parser.add_argument(
+            "path",
+            type=str,
+            help="File to import, or - for stdin",
+        )
+        parser.add_argument(
+            "--format",
+            choices=registrations.IMPORT_FORMATS,
+            help="Input format (default: from the file extension, csv for "
+            "stdin)",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=registrations.IMPORT_CHUNK_SIZE,
+            help="Rows validated and inserted per transaction "
+            f"(default {registrations.IMPORT_CHUNK_SIZE})",
+        )
+        parser.add_argument(
+            "--results",
+            type=str,
+            help="Write per-row results to this file instead of stdout",
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options["chunk_size"]
+        if chunk_size < 1:
+            raise CommandError("--chunk-size must be a positive integer.")
+        try:
+            event = Event.objects.only("id", "name", "status").get(
+                id=options["event_id"]
+            )
+        except (Event.DoesNotExist, ValidationError):
+            raise CommandError(f"Event {options['event_id']} not found.")
+
+        path = options["path"]
+        fmt = options["format"]
+        if fmt is None:
+            suffix = Path(path).suffix.lower()
+            fmt = "jsonl" if suffix in (".jsonl", ".ndjson") else "csv"
+
+        source = (
+            sys.stdin if path == "-"
+            else open(path, encoding="utf-8-sig", newline="")
+        )
+        output = (
+            open(options["results"], "w", encoding="utf-8")
+            if options["results"] else self.stdout
+        )
+        counts = Counter()
+        try:
+            for result in registrations.import_registrations(
+                event,
+                registrations.read_rows(source, fmt),
+                chunk_size,
+            ):
+                counts[result["status"]] += 1
+                output.write(json.dumps(result, ensure_ascii=False) + "\n")
+        finally:
+            if source is not sys.stdin:
+                source.close()
+            if output is not self.stdout:
+                output.close()
+
+        summary = ", ".join(
+            f"{status}: {count}" for status, count in sorted(counts.items())
+        )
+        style = (
+            self.style.WARNING if counts[registrations.INVALID]
+            else self.style.SUCCESS
+        )
+        # Only the loaded fields; str(event) would fetch event_time.
+        self.stderr.write(style(
+            f"Imported {event.name} ({event.id}): {summary or 'no rows'}"
+        ))
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 06:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0002_alter_event_event_time_eventregistration'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='content_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0003_event_content_hash'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(
+                fields=['event_time', 'id'],
+                name='event_time_id_idx',
+            ),
+        ),
+    ]
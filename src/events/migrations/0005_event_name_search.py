@@ -0,0 +1,94 @@
+from django.db import DatabaseError, migrations
+
+# A copy of the SQL in events.search as of this migration; later changes
+# to that module get their own migration.
+FTS_TABLE = "events_event_fts"
+FTS_MAP_TABLE = "events_event_fts_map"
+TRIGRAM_INDEX = "event_name_trgm_idx"
+
+FTS_ROWID = f"(SELECT rowid FROM {FTS_MAP_TABLE} WHERE event_id = %s.id)"
+SQLITE_TABLES = {
+    FTS_MAP_TABLE: (
+        f"CREATE TABLE IF NOT EXISTS {FTS_MAP_TABLE} ("
+        "rowid INTEGER PRIMARY KEY, event_id char(32) NOT NULL UNIQUE)"
+    ),
+    FTS_TABLE: (
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+        "name, tokenize='trigram')"
+    ),
+}
+SQLITE_TRIGGERS = {
+    f"{FTS_TABLE}_ai": (
+        f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai "
+        "AFTER INSERT ON events_event BEGIN "
+        f"INSERT INTO {FTS_MAP_TABLE}(event_id) VALUES (new.id); "
+        f"INSERT INTO {FTS_TABLE}(rowid, name) "
+        f"VALUES ({FTS_ROWID % 'new'}, new.name); "
+        "END"
+    ),
+    f"{FTS_TABLE}_ad": (
+        f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad "
+        "AFTER DELETE ON events_event BEGIN "
+        f"DELETE FROM {FTS_TABLE} WHERE rowid = {FTS_ROWID % 'old'}; "
+        f"DELETE FROM {FTS_MAP_TABLE} WHERE event_id = old.id; "
+        "END"
+    ),
+    f"{FTS_TABLE}_au": (
+        f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au "
+        "AFTER UPDATE OF name ON events_event BEGIN "
+        f"UPDATE {FTS_TABLE} SET name = new.name "
+        f"WHERE rowid = {FTS_ROWID % 'new'}; "
+        "END"
+    ),
+}
+
+
+def install_search(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        try:
+            for sql in SQLITE_TABLES.values():
+                schema_editor.execute(sql)
+        except DatabaseError:
+            # No FTS5 trigram tokenizer; search scans names instead.
+            schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_MAP_TABLE}")
+            return
+        for sql in SQLITE_TRIGGERS.values():
+            schema_editor.execute(sql)
+        schema_editor.execute(
+            f"INSERT INTO {FTS_MAP_TABLE}(event_id) "
+            "SELECT id FROM events_event"
+        )
+        schema_editor.execute(
+            f"INSERT INTO {FTS_TABLE}(rowid, name) "
+            f"SELECT m.rowid, e.name FROM {FTS_MAP_TABLE} m "
+            "JOIN events_event e ON e.id = m.event_id"
+        )
+    elif vendor == "postgresql":
+        schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {TRIGRAM_INDEX} "
+            "ON events_event USING gin (name gin_trgm_ops)"
+        )
+
+
+def uninstall_search(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        for trigger in SQLITE_TRIGGERS:
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        for table in SQLITE_TABLES:
+            schema_editor.execute(f"DROP TABLE IF EXISTS {table}")
+    elif vendor == "postgresql":
+        schema_editor.execute(f"DROP INDEX IF EXISTS {TRIGRAM_INDEX}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0004_event_time_id_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(install_search, uninstall_search),
+    ]
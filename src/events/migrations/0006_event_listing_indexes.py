@@ -0,0 +1,40 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0005_event_name_search'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(
+                fields=['status', 'event_time', 'id'],
+                name='event_status_time_idx',
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(
+                fields=['venue', 'event_time'],
+                name='event_venue_time_idx',
+            ),
+        ),
+        migrations.AlterField(
+            model_name='event',
+            name='venue',
+            field=models.ForeignKey(
+                blank=True,
+                db_index=False,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name='events',
+                to='events.venue'
+            ),
+        ),
+    ]
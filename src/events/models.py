@@ -31,13 +31,16 @@ class Event(models.Model):
         choices=Status.choices,
         default=Status.OPEN
     )
+    # Indexed by event_venue_time_idx, which leads with venue.
     venue = models.ForeignKey(
         Venue,
         null=True,
         blank=True,
         on_delete=models.SET_NULL,
-        related_name="events"
+        related_name="events",
+        db_index=False,
     )
+    content_hash = models.CharField(max_length=64, blank=True, editable=False)
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -46,10 +49,40 @@ class Event(models.Model):
         verbose_name = "Мероприятие"
         verbose_name_plural = "Мероприятия"
         ordering = ["event_time"]
+        indexes = [
+            # Keyset pages and the admin date filter.
+            models.Index(
+                fields=["event_time", "id"],
+                name="event_time_id_idx",
+            ),
+            # /api/events (status=open ordered by (event_time, id)) and the
+            # admin status filter.
+            models.Index(
+                fields=["status", "event_time", "id"],
+                name="event_status_time_idx",
+            ),
+            # Admin: venue filter ordered by -event_time; also serves the
+            # foreign key.
+            models.Index(
+                fields=["venue", "event_time"],
+                name="event_venue_time_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.name} @ {self.event_time.isoformat()}"
 
+    def save(self, *args, **kwargs):
+        # content_hash describes the provider payload last written by the
+        # sync, which only uses bulk queries. Any other write may diverge
+        # from it, so the next sync must compare the row field by field.
+        # Queryset update()s of sync fields have to clear it themselves.
+        self.content_hash = ""
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            kwargs["update_fields"] = {*update_fields, "content_hash"}
+        super().save(*args, **kwargs)
+
 
 class EventRegistration(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -0,0 +1,260 @@
+import atexit
+import functools
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+from outbox.models import OutboxMessage
+from outbox.publishers import MAX_IN_FLIGHT, BasePublisher
+
+logger = logging.getLogger(__name__)
+
+
+NOTIFICATIONS_API_URL = getattr(
+    settings,
+    "NOTIFICATIONS_API_URL",
+    "https://notifications.k3scluster.tech/api/notifications",
+)
+NOTIFICATIONS_BATCH_URL = getattr(settings, "NOTIFICATIONS_BATCH_URL", None)
+NOTIFICATIONS_TOKEN = getattr(settings, "NOTIFICATIONS_TOKEN", "")
+OWNER_ID = getattr(
+    settings,
+    "NOTIFICATIONS_OWNER_ID",
+    "3fa85f64-5717-4562-b3fc-2c963f66afa7",
+)
+CONNECT_TIMEOUT = getattr(settings, "NOTIFICATIONS_CONNECT_TIMEOUT", 3.05)
+NOTIFICATIONS_TIMEOUT = getattr(settings, "NOTIFICATIONS_TIMEOUT", 5)
+BATCH_SIZE = getattr(settings, "NOTIFICATIONS_BATCH_SIZE", 50)
+BATCH_WINDOW = getattr(settings, "NOTIFICATIONS_BATCH_WINDOW", 0.05)
+
+CONFIRMATION_TOPIC = "registration_confirmation"
+EMAIL_FIELDS = ("email", "subject", "message")
+
+
+def confirmation_content(
+        email: str,
+        full_name: str,
+        confirmation_code: str,
+        event_name: str
+     ) -> dict:
+    return {
+        "email": email,
+        "subject": f"Регистрация на мероприятие: {event_name}",
+        "message": (
+            f"Здравствуйте, {full_name}!\n\nВаш код подтверждения: "
+            f"{confirmation_code}\n\nСпасибо за регистрацию!"
+        ),
+    }
+
+
+def confirmation_email(
+        registration,
+        event_name: str
+     ) -> OutboxMessage:
+    """
+    Unsaved outbox message carrying the confirmation email for
+    ``registration``; save it in the transaction that saves the
+    registration. Emails are keyed by registration, so the ones for a
+    popular event are not delivered one at a time.
+    """
+    return OutboxMessage(
+        topic=CONFIRMATION_TOPIC,
+        key=f"registration:{registration.id}",
+        payload={
+            "event_id": str(registration.event_id),
+            "registration_id": str(registration.id),
+            **confirmation_content(
+                registration.email,
+                registration.full_name,
+                registration.confirmation_code,
+                event_name,
+            ),
+        },
+    )
+
+
+class NotificationsClient:
+    """
+    Client for the notifications API over one pooled keep-alive session.
+
+    ``send_many`` delivers a list of emails with at most
+    ``max_in_flight`` requests outstanding: one request per email, or
+    ``batch_size`` emails per request when the API's ``batch_url`` is
+    configured. ``submit`` sends a single email and returns a future;
+    with a ``batch_url``, emails submitted within ``batch_window`` seconds
+    of each other (from any thread) are coalesced into one ``send_many``
+    call, otherwise each is sent right away, since waiting would not save
+    a request. Futures resolve to ``None`` on success or to the error
+    message.
+    """
+
+    def __init__(
+            self,
+            url: str = NOTIFICATIONS_API_URL,
+            token: str = NOTIFICATIONS_TOKEN,
+            owner_id: str = OWNER_ID,
+            timeout: float = NOTIFICATIONS_TIMEOUT,
+            max_in_flight: int = MAX_IN_FLIGHT,
+            batch_url: Optional[str] = NOTIFICATIONS_BATCH_URL,
+            batch_size: int = BATCH_SIZE,
+            batch_window: float = BATCH_WINDOW,
+         ):
+        self.url = url
+        self.batch_url = batch_url
+        self.owner_id = owner_id
+        self.timeout = (CONNECT_TIMEOUT, timeout)
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=max_in_flight,
+            pool_maxsize=max_in_flight,
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        if token:
+            self.session.headers["Authorization"] = f"Bearer {token}"
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_in_flight,
+            thread_name_prefix="notifications",
+        )
+        self._pending = []
+        self._cond = threading.Condition()
+        self._flusher = None
+        self._closed = False
+
+    def email_payload(self, email: str, subject: str, message: str) -> dict:
+        return {
+            "owner_id": self.owner_id,
+            "email": email,
+            "subject": subject,
+            "message": message,
+        }
+
+    def _post(self, url: str, body) -> Optional[str]:
+        try:
+            resp = self.session.post(url, json=body, timeout=self.timeout)
+            resp.raise_for_status()
+        except requests.RequestException as exc:
+            logger.error(f"Failed to send notification to {url}: {exc}")
+            return str(exc)
+        return None
+
+    def send(self, payload: dict) -> Optional[str]:
+        return self._post(self.url, payload)
+
+    def send_many(self, payloads: list) -> list:
+        """Returns the error (or ``None``) for every payload, in order."""
+        if not self.batch_url:
+            return list(self.executor.map(self.send, payloads))
+        batches = [
+            payloads[start:start + self.batch_size]
+            for start in range(0, len(payloads), self.batch_size)
+        ]
+        errors = []
+        for batch, error in zip(
+            batches,
+            self.executor.map(
+                functools.partial(self._post, self.batch_url),
+                batches,
+            ),
+        ):
+            errors.extend([error] * len(batch))
+        return errors
+
+    def submit(self, payload: dict) -> Future:
+        future = Future()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("NotificationsClient is closed.")
+            if not self.batch_url:
+                return self.executor.submit(self.send, payload)
+            self._pending.append((payload, future))
+            if self._flusher is None:
+                self._flusher = threading.Thread(
+                    target=self._flush_loop,
+                    name="notifications-flusher",
+                    daemon=True,
+                )
+                self._flusher.start()
+            self._cond.notify()
+        return future
+
+    def _next_batch(self) -> list:
+        with self._cond:
+            while not self._pending and not self._closed:
+                self._cond.wait()
+            deadline = time.monotonic() + self.batch_window
+            while len(self._pending) < self.batch_size and not self._closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch = self._pending[:self.batch_size]
+            del self._pending[:self.batch_size]
+            return batch
+
+    def _flush_loop(self) -> None:
+        while batch := self._next_batch():
+            try:
+                errors = self.send_many([payload for payload, _ in batch])
+            except Exception as exc:
+                logger.exception("Failed to send a notification batch")
+                errors = [str(exc)] * len(batch)
+            for (_, future), error in zip(batch, errors):
+                future.set_result(error)
+
+    def close(self) -> None:
+        """Deliver whatever is still queued, then release the pool."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            flusher = self._flusher
+        if flusher is not None:
+            flusher.join()
+        self.executor.shutdown(wait=True)
+        self.session.close()
+
+
+@functools.cache
+def get_client() -> NotificationsClient:
+    """Process-wide client shared by request handlers."""
+    client = NotificationsClient()
+    atexit.register(client.close)
+    return client
+
+
+class ConfirmationEmailPublisher(BasePublisher):
+    """
+    Delivers ``registration_confirmation`` outbox messages: each relay
+    batch becomes one ``NotificationsClient.send_many`` call.
+    """
+
+    def __init__(self, max_in_flight: int = MAX_IN_FLIGHT, **options):
+        super().__init__(max_in_flight=max_in_flight)
+        self.client = NotificationsClient(
+            max_in_flight=max_in_flight,
+            **options
+        )
+
+    def publish(self, messages: list) -> dict:
+        errors = self.client.send_many([
+            self.client.email_payload(
+                *(msg.payload[field] for field in EMAIL_FIELDS)
+            )
+            for msg in messages
+        ])
+        return {
+            msg.id: error
+            for msg, error in zip(messages, errors)
+            if error is not None
+        }
+
+    def close(self) -> None:
+        self.client.close()
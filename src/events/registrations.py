@@ -0,0 +1,199 @@
+import csv
+import json
+import uuid
+from itertools import islice
+from typing import Iterable, Iterator, Optional
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.validators import EmailValidator
+from django.db import IntegrityError, transaction
+
+from outbox.models import OutboxMessage
+
+from .models import Event, EventRegistration
+from .notifications import confirmation_email
+
+IMPORT_CHUNK_SIZE = getattr(settings, "REGISTRATION_IMPORT_CHUNK_SIZE", 1000)
+IMPORT_FORMATS = ("csv", "jsonl")
+FULL_NAME_MAX_LENGTH = EventRegistration._meta.get_field(
+    "full_name"
+).max_length
+
+CREATED = "created"
+DUPLICATE = "duplicate"
+INVALID = "invalid"
+
+validate_email = EmailValidator()
+
+
+def register(
+        event: Event,
+        full_name: str,
+        email: str
+     ) -> Optional[EventRegistration]:
+    """
+    Insert one registration and its confirmation email in a single
+    transaction. Returns ``None`` when ``email`` is already registered
+    for ``event``, as reported by the ``(event, email)`` constraint.
+    """
+    try:
+        with transaction.atomic():
+            registration = EventRegistration.objects.create(
+                event=event,
+                full_name=full_name,
+                email=email,
+                confirmation_code=uuid.uuid4().hex[:6].upper(),
+            )
+            confirmation_email(registration, event.name).save()
+    except IntegrityError:
+        # Only the failure path pays for telling a duplicate apart from
+        # any other constraint violation.
+        if not EventRegistration.objects.filter(
+            event=event,
+            email=email
+        ).exists():
+            raise
+        return None
+    return registration
+
+
+def read_rows(lines: Iterable[str], fmt: str) -> Iterator[dict]:
+    """
+    Lazily parse ``lines`` (CSV with a header row, or JSON Lines) into
+    dicts. A malformed JSON line yields ``{"_error": ...}`` instead of
+    aborting the import.
+    """
+    if fmt == "csv":
+        yield from csv.DictReader(lines)
+        return
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as exc:
+            yield {"_error": f"Invalid JSON: {exc}"}
+            continue
+        if not isinstance(row, dict):
+            row = {"_error": "Expected a JSON object."}
+        yield row
+
+
+def _validate_chunk(chunk: list[tuple[int, dict]]):
+    """
+    One pass over the chunk: normalize and validate every row, drop
+    in-chunk repeats of an email. Returns ``(valid, results)``, where
+    ``valid`` maps email -> ``(row_number, full_name)``.
+    """
+    valid = {}
+    results = {}
+    for number, row in chunk:
+        if "_error" in row:
+            results[number] = _result(number, "", INVALID, [row["_error"]])
+            continue
+        full_name = str(row.get("full_name") or "").strip()
+        email = str(row.get("email") or "").strip()
+        errors = []
+        if not full_name:
+            errors.append("full_name is required.")
+        elif len(full_name) > FULL_NAME_MAX_LENGTH:
+            errors.append(
+                f"full_name must be at most {FULL_NAME_MAX_LENGTH} "
+                "characters."
+            )
+        try:
+            validate_email(email)
+        except ValidationError:
+            errors.append("Enter a valid email address.")
+        if errors:
+            results[number] = _result(number, email, INVALID, errors)
+        elif email in valid:
+            results[number] = _result(number, email, DUPLICATE)
+        else:
+            valid[email] = (number, full_name)
+    return valid, results
+
+
+def _result(number: int, email: str, status: str, errors=None) -> dict:
+    result = {"row": number, "email": email, "status": status}
+    if errors:
+        result["errors"] = errors
+    return result
+
+
+def _import_chunk(event: Event, chunk: list[tuple[int, dict]]) -> list[dict]:
+    valid, results = _validate_chunk(chunk)
+    if valid:
+        with transaction.atomic():
+            existing = set(
+                EventRegistration.objects.filter(
+                    event=event,
+                    email__in=list(valid),
+                ).values_list("email", flat=True)
+            )
+            registrations = [
+                EventRegistration(
+                    id=uuid.uuid4(),
+                    event=event,
+                    full_name=full_name,
+                    email=email,
+                    confirmation_code=uuid.uuid4().hex[:6].upper(),
+                )
+                for email, (_, full_name) in valid.items()
+                if email not in existing
+            ]
+            inserted = set()
+            if registrations:
+                EventRegistration.objects.bulk_create(
+                    registrations,
+                    ignore_conflicts=True,
+                )
+                # ignore_conflicts hides which rows lost a race with a
+                # concurrent signup; the ids were chosen here, so ask.
+                inserted = set(
+                    EventRegistration.objects.filter(
+                        id__in=[r.id for r in registrations]
+                    ).values_list("id", flat=True)
+                )
+            OutboxMessage.bulk_enqueue([
+                confirmation_email(registration, event.name)
+                for registration in registrations
+                if registration.id in inserted
+            ])
+        created = {r.email for r in registrations if r.id in inserted}
+        for email, (number, _) in valid.items():
+            status = CREATED if email in created else DUPLICATE
+            results[number] = _result(number, email, status)
+    return [results[number] for number, _ in chunk]
+
+
+def import_registrations(
+        event: Event,
+        rows: Iterable[dict],
+        chunk_size: int = IMPORT_CHUNK_SIZE
+     ) -> Iterator[dict]:
+    """
+    Register ``rows`` (dicts with ``full_name`` and ``email``) for
+    ``event`` chunk by chunk and yield one result per row, in input order:
+    ``{"row": n, "email": ..., "status": "created" | "duplicate" |
+    "invalid", "errors": [...]}``.
+
+    Each chunk costs one query for existing emails, one
+    ``bulk_create(ignore_conflicts=True)``, one query to confirm the
+    inserted ids and one bulk insert of confirmation outbox messages,
+    all in a single transaction. Only one chunk is held in memory.
+    """
+    numbered = enumerate(rows, start=1)
+    closed = event.status != Event.Status.OPEN
+    while chunk := list(islice(numbered, chunk_size)):
+        if closed:
+            for number, row in chunk:
+                yield _result(
+                    number,
+                    str(row.get("email") or "").strip(),
+                    INVALID,
+                    ["Registration is closed for this event."],
+                )
+            continue
+        yield from _import_chunk(event, chunk)
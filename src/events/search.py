@@ -0,0 +1,280 @@
+import logging
+import re
+from typing import Optional
+
+from django.db import DatabaseError, connections
+from django.db.models import BooleanField, FloatField, Q
+from django.db.models.expressions import RawSQL
+from rest_framework import filters
+
+logger = logging.getLogger(__name__)
+
+
+FTS_TABLE = "events_event_fts"
+FTS_MAP_TABLE = "events_event_fts_map"
+TRIGRAM_INDEX = "event_name_trgm_idx"
+TERM_RE = re.compile(r"\w+")
+# Shortest term the trigram indexes can match.
+MIN_INDEXED_TERM = 3
+
+# The FTS5 rows are keyed by the INTEGER PRIMARY KEY of a map table
+# holding the event id: events_event has a UUID primary key, so its
+# implicit rowid may change on VACUUM or when Django rebuilds the table.
+SQLITE_TABLES = {
+    FTS_MAP_TABLE: (
+        f"CREATE TABLE IF NOT EXISTS {FTS_MAP_TABLE} ("
+        "rowid INTEGER PRIMARY KEY, event_id char(32) NOT NULL UNIQUE)"
+    ),
+    FTS_TABLE: (
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+        "name, tokenize='trigram')"
+    ),
+}
+_FTS_ROWID = f"(SELECT rowid FROM {FTS_MAP_TABLE} WHERE event_id = %s.id)"
+# Triggers keep the index in sync on every write path (ORM saves,
+# bulk_create upserts and bulk_update in sync_events, raw SQL).
+SQLITE_TRIGGERS = {
+    f"{FTS_TABLE}_ai": (
+        f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai "
+        "AFTER INSERT ON events_event BEGIN "
+        f"INSERT INTO {FTS_MAP_TABLE}(event_id) VALUES (new.id); "
+        f"INSERT INTO {FTS_TABLE}(rowid, name) "
+        f"VALUES ({_FTS_ROWID % 'new'}, new.name); "
+        "END"
+    ),
+    f"{FTS_TABLE}_ad": (
+        f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad "
+        "AFTER DELETE ON events_event BEGIN "
+        f"DELETE FROM {FTS_TABLE} WHERE rowid = {_FTS_ROWID % 'old'}; "
+        f"DELETE FROM {FTS_MAP_TABLE} WHERE event_id = old.id; "
+        "END"
+    ),
+    f"{FTS_TABLE}_au": (
+        f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au "
+        "AFTER UPDATE OF name ON events_event BEGIN "
+        f"UPDATE {FTS_TABLE} SET name = new.name "
+        f"WHERE rowid = {_FTS_ROWID % 'new'}; "
+        "END"
+    ),
+}
+SQLITE_OBJECTS = {*SQLITE_TABLES, *SQLITE_TRIGGERS}
+
+# Alias -> whether the search index is usable, so searches do not have
+# to look it up every time; install() and migrations reset it.
+_available = {}
+
+
+def search_terms(query: str) -> list[str]:
+    return TERM_RE.findall(query or "")
+
+
+def _sqlite_objects(cursor) -> set[str]:
+    cursor.execute(
+        "SELECT name FROM sqlite_master WHERE name IN (%s, %s) OR "
+        "(type = 'trigger' AND tbl_name = 'events_event')",
+        list(SQLITE_TABLES),
+    )
+    return {row[0] for row in cursor.fetchall()}
+
+
+def install(schema_editor, model) -> None:
+    """
+    Create the search index for the current database: a trigram FTS5
+    table on SQLite, a trigram GIN index on PostgreSQL. Missing pieces
+    are (re)created and the FTS table is refilled, so this is safe to run
+    repeatedly, e.g. after a migration rebuilt ``events_event``.
+    Databases without support are left alone and search falls back to
+    a substring scan.
+    """
+    _available.pop(schema_editor.connection.alias, None)
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        _install_sqlite(schema_editor)
+    elif vendor == "postgresql":
+        _install_postgresql(schema_editor, model)
+
+
+def _install_sqlite(schema_editor) -> None:
+    with schema_editor.connection.cursor() as cursor:
+        existing = _sqlite_objects(cursor)
+    if existing >= SQLITE_OBJECTS:
+        return
+    try:
+        for sql in SQLITE_TABLES.values():
+            schema_editor.execute(sql)
+    except DatabaseError as exc:
+        logger.warning(
+            "SQLite FTS5 trigram tokenizer is unavailable, event search "
+            "scans names: %s",
+            exc
+        )
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_MAP_TABLE}")
+        return
+    for sql in SQLITE_TRIGGERS.values():
+        schema_editor.execute(sql)
+    # Writes made while the triggers were missing are not indexed.
+    schema_editor.execute(f"DELETE FROM {FTS_TABLE}")
+    schema_editor.execute(f"DELETE FROM {FTS_MAP_TABLE}")
+    schema_editor.execute(
+        f"INSERT INTO {FTS_MAP_TABLE}(event_id) SELECT id FROM events_event"
+    )
+    schema_editor.execute(
+        f"INSERT INTO {FTS_TABLE}(rowid, name) "
+        f"SELECT m.rowid, e.name FROM {FTS_MAP_TABLE} m "
+        "JOIN events_event e ON e.id = m.event_id"
+    )
+
+
+def _install_postgresql(schema_editor, model) -> None:
+    from django.contrib.postgres.indexes import GinIndex, OpClass
+
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT indexname FROM pg_indexes WHERE tablename = %s",
+            [model._meta.db_table],
+        )
+        existing = {row[0] for row in cursor.fetchall()}
+    if TRIGRAM_INDEX not in existing:
+        schema_editor.add_index(
+            model,
+            GinIndex(OpClass("name", name="gin_trgm_ops"), name=TRIGRAM_INDEX),
+        )
+
+
+def ensure_sqlite_index(sender, using="default", **kwargs) -> None:
+    """
+    ``post_migrate`` hook: SQLite migrations that rebuild
+    ``events_event`` drop its triggers, so restore them and refill the
+    index. Migrations may also have added or removed the index, so
+    ``is_available`` looks it up again.
+    """
+    from .models import Event
+
+    _available.pop(using, None)
+    connection = connections[using]
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        existing = _sqlite_objects(cursor)
+    if FTS_TABLE not in existing or existing >= SQLITE_OBJECTS:
+        return
+    with connection.schema_editor() as schema_editor:
+        install(schema_editor, Event)
+
+
+def is_available(using: str = "default") -> bool:
+    """Whether ``using`` has the search index; looked up once per alias."""
+    if using not in _available:
+        connection = connections[using]
+        if connection.vendor == "sqlite":
+            with connection.cursor() as cursor:
+                available = FTS_TABLE in _sqlite_objects(cursor)
+        else:
+            available = connection.vendor == "postgresql"
+        _available[using] = available
+    return _available[using]
+
+
+def search_events(queryset, query: str, available: Optional[bool] = None):
+    """
+    Filter ``queryset`` to events whose name contains every term of
+    ``query``, case-insensitively, and annotate ``search_rank`` (higher
+    is better).
+
+    Uses the trigram FTS5 table on SQLite and the trigram GIN index on
+    PostgreSQL; elsewhere, or while the index is missing, falls back to
+    a case-insensitive substring match per term with a constant rank.
+    Terms shorter than ``MIN_INDEXED_TERM`` are always matched that way,
+    so both paths and both databases return the same events. Async
+    callers look up ``available`` themselves, since ``is_available`` may
+    query the database.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return queryset
+    if available is None:
+        available = is_available(queryset.db)
+    if not available:
+        return _search_substrings(queryset, terms)
+    if connections[queryset.db].vendor == "sqlite":
+        return _search_sqlite(queryset, terms)
+    return _search_postgresql(queryset, query, terms)
+
+
+def _search_substrings(queryset, terms):
+    return queryset.filter(_contains_all(queryset, terms)).annotate(
+        search_rank=RawSQL("0", [], output_field=FloatField())
+    )
+
+
+def _contains_all(queryset, terms) -> Q:
+    # SQLite's LIKE folds the case of ASCII letters only; its REGEXP is
+    # Python's re, which folds all of Unicode like the FTS5 table does.
+    if connections[queryset.db].vendor == "sqlite":
+        lookups = [("name__iregex", re.escape(term)) for term in terms]
+    else:
+        lookups = [("name__icontains", term) for term in terms]
+    condition = Q()
+    for lookup in lookups:
+        condition &= Q(lookup)
+    return condition
+
+
+def _search_sqlite(queryset, terms):
+    indexed = [term for term in terms if len(term) >= MIN_INDEXED_TERM]
+    if not indexed:
+        return _search_substrings(queryset, terms)
+    short = [term for term in terms if len(term) < MIN_INDEXED_TERM]
+    # Quoted trigram terms match as substrings, ANDed together.
+    match = " ".join(f'"{term}"' for term in indexed)
+    table = queryset.model._meta.db_table
+    fts_rowid = _FTS_ROWID % f'"{table}"'
+    return queryset.filter(
+        RawSQL(
+            f'"{table}".id IN (SELECT m.event_id FROM {FTS_TABLE} '
+            f"JOIN {FTS_MAP_TABLE} m ON m.rowid = {FTS_TABLE}.rowid "
+            f"WHERE {FTS_TABLE} MATCH %s)",
+            [match],
+            output_field=BooleanField(),
+        ),
+        _contains_all(queryset, short),
+    ).annotate(
+        # bm25() is negative, lower is better.
+        search_rank=RawSQL(
+            f"(SELECT -bm25({FTS_TABLE}) FROM {FTS_TABLE} "
+            f"WHERE {FTS_TABLE} MATCH %s AND rowid = {fts_rowid})",
+            [match],
+            output_field=FloatField(),
+        )
+    )
+
+
+def _search_postgresql(queryset, query, terms):
+    from django.contrib.postgres.search import TrigramSimilarity
+
+    # ILIKE per term, served by the trigram index like the SQLite match.
+    return queryset.filter(_contains_all(queryset, terms)).annotate(
+        search_rank=TrigramSimilarity("name", query.strip())
+    )
+
+
+class EventSearchFilter(filters.SearchFilter):
+    """
+    ``?search=`` backed by ``search_events``. Results are ordered by rank
+    unless the client asked for an explicit ``ordering``.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, "")
+        if not search_terms(query):
+            return queryset
+        return self.rank(request, search_events(queryset, query))
+
+    def rank(self, request, queryset):
+        if request.query_params.get("ordering"):
+            return queryset
+        return queryset.order_by(
+            "-search_rank",
+            *queryset.query.order_by or queryset.model._meta.ordering
+        )
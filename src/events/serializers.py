@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from rest_framework.fields import empty
 
 from .models import Event, EventRegistration
 
@@ -11,12 +12,63 @@ class EventSerializer(serializers.ModelSerializer):
         fields = ("id", "name", "event_time", "status", "venue", "venue_name")
 
 
+class LeanEventSerializer:
+    """
+    Read-only fast path producing the same output as ``EventSerializer``.
+
+    The serializer's fields are compiled once into ``(key, lookup,
+    to_representation)`` triples; rows are then fetched with ``values()``
+    (the venue name via the join) and turned into plain dicts without
+    DRF's per-field machinery. Values are primitives only, so the JSON
+    encoder never falls back to ``default()``.
+    """
+
+    def __init__(self, serializer_class=EventSerializer):
+        self.mapping = []
+        for key, field in serializer_class().fields.items():
+            lookup = "__".join(field.source_attrs)
+            if isinstance(field, serializers.PrimaryKeyRelatedField):
+                to_representation = str
+            else:
+                to_representation = field.to_representation
+            # A dotted source across a null relation is skipped by DRF
+            # unless the field has a default or allows null.
+            skip_null = (
+                len(field.source_attrs) > 1
+                and field.default is empty
+                and not field.allow_null
+                and not field.required
+            )
+            self.mapping.append((key, lookup, to_representation, skip_null))
+        self.lookups = [lookup for _, lookup, _, _ in self.mapping]
+
+    def values(self, queryset):
+        return queryset.values(*self.lookups)
+
+    def to_representation(self, row: dict) -> dict:
+        data = {}
+        for key, lookup, to_representation, skip_null in self.mapping:
+            value = row[lookup]
+            if value is None:
+                if not skip_null:
+                    data[key] = None
+            else:
+                data[key] = to_representation(value)
+        return data
+
+    def many(self, rows) -> list[dict]:
+        to_representation = self.to_representation
+        return [to_representation(row) for row in rows]
+
+
 class EventRegistrationSerializer(serializers.ModelSerializer):
     class Meta:
         model = EventRegistration
         fields = ["full_name", "email"]
 
     def validate(self, attrs):
+        # Duplicate emails are rejected by the (event, email) unique
+        # constraint on insert, see EventRegisterAPIView.
         event = self.context["event"]
 
         if event.status != "open":
@@ -24,12 +76,4 @@ class EventRegistrationSerializer(serializers.ModelSerializer):
                 "Registration is closed for this event."
             )
 
-        if EventRegistration.objects.filter(
-            event=event,
-            email=attrs["email"]
-        ).exists():
-            raise serializers.ValidationError(
-                "This email is already registered for this event."
-            )
-
         return attrs
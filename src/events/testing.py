@@ -0,0 +1,48 @@
+import time
+
+from core.testing import StubHandler, StubServer
+
+
+class NotificationsStubHandler(StubHandler):
+    def do_POST(self):
+        body = self.read_json()
+        self.stub.record((self.path, body, self.client_address[1]))
+        if self.stub.delay:
+            time.sleep(self.stub.delay)
+        emails = body if isinstance(body, list) else [body]
+        failed = any(
+            item.get("email") in self.stub.fail_emails for item in emails
+        )
+        self.reply(500 if failed else 200)
+
+
+class NotificationsStubServer(StubServer):
+    """
+    Local stand-in for the notifications API, for tests and load tests.
+
+    Accepts ``POST`` with one email object, or with a list of them on the
+    batch path, records every request in ``requests`` as ``(path, body,
+    client_port)`` and answers ``200``; ``fail_emails`` get ``500`` and
+    ``delay`` seconds are added to every response. Use as a context
+    manager; ``url`` and ``batch_url`` point at the running server.
+    """
+
+    handler_class = NotificationsStubHandler
+    path = "/api/notifications"
+    batch_path = "/api/notifications/batch"
+    name = "notifications-stub"
+
+    def __init__(self, delay: float = 0, fail_emails=()):
+        self.delay = delay
+        self.fail_emails = set(fail_emails)
+        super().__init__()
+        self.batch_url = f"{self.origin}{self.batch_path}"
+
+    @property
+    def emails(self) -> list:
+        with self._lock:
+            return [
+                item["email"]
+                for _, body, _ in self.requests
+                for item in (body if isinstance(body, list) else [body])
+            ]
@@ -0,0 +1,726 @@
+import json
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import path
+from django.utils.http import parse_http_date
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from core.testing import LOCMEM_CACHES
+from outbox.models import OutboxMessage
+from syncapp.testing import ProviderStubServer
+
+from . import notifications
+from .async_views import AsyncEventListView, AsyncEventRegisterView
+from .cache import CACHE_ALIAS, cache_stats, get_events_version
+from .management.commands.explain_queries import index_walks
+from .models import Event, EventRegistration, Venue
+from .registrations import import_registrations, read_rows
+from .search import is_available, search_events
+from .serializers import EventSerializer, LeanEventSerializer
+from .testing import NotificationsStubServer
+from .views import DUPLICATE_REGISTRATION, REGISTERED
+
+# The async views, routed as with EVENTS_ASYNC_VIEWS (see AsyncViewTests).
+urlpatterns = [
+    path("api/events", AsyncEventListView.as_view()),
+    path(
+        "api/events/<uuid:event_id>/register",
+        AsyncEventRegisterView.as_view(),
+    ),
+]
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class LeanEventSerializerTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        venue = Venue.objects.create(name="Зал «Ёлка»   \"A\" & <b>")
+        start = datetime(2025, 3, 30, 0, 59, 59, 123456, tzinfo=timezone.utc)
+        Event.objects.bulk_create([
+            Event(
+                id=uuid.UUID(int=index + 1),
+                name=f"Событие {index} \\ \U0001F3B8",
+                event_time=start + timedelta(hours=index, seconds=index),
+                status=Event.Status.OPEN,
+                venue=venue if index % 2 else None,
+            )
+            for index in range(6)
+        ] + [
+            Event(
+                id=uuid.UUID(int=100),
+                name="Whole seconds",
+                event_time=start.replace(microsecond=0),
+                status=Event.Status.OPEN,
+            ),
+        ])
+
+    def setUp(self):
+        caches[CACHE_ALIAS].clear()
+
+    def render_serializer(self, queryset):
+        return JSONRenderer().render(
+            EventSerializer(queryset.select_related("venue"), many=True).data
+        )
+
+    def render_lean(self, queryset):
+        lean = LeanEventSerializer(EventSerializer)
+        return JSONRenderer().render(lean.many(lean.values(queryset)))
+
+    def test_output_is_byte_identical(self):
+        queryset = Event.objects.order_by("event_time", "id")
+        self.assertEqual(
+            self.render_lean(queryset),
+            self.render_serializer(queryset),
+        )
+
+    @override_settings(TIME_ZONE="Europe/Moscow")
+    def test_output_is_byte_identical_in_local_time(self):
+        queryset = Event.objects.order_by("event_time", "id")
+        self.assertEqual(
+            self.render_lean(queryset),
+            self.render_serializer(queryset),
+        )
+
+    def test_list_endpoint_matches_serializer(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user("lean"))
+        queryset = Event.objects.order_by("event_time")
+        response = client.get("/api/events")
+        expected = JSONRenderer().render({
+            "count": queryset.count(),
+            "next": None,
+            "previous": None,
+            "results": EventSerializer(queryset[:10], many=True).data,
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, expected)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class EventListCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("cached")
+        Event.objects.create(
+            name="Концерт",
+            event_time=datetime(2030, 1, 1, tzinfo=timezone.utc),
+        )
+
+    def setUp(self):
+        caches[CACHE_ALIAS].clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_hits_are_counted_without_cache_writes(self):
+        before = cache_stats()
+        self.assertEqual(self.client.get("/api/events")["X-Cache"], "MISS")
+        cache = caches[CACHE_ALIAS]
+        with (
+            mock.patch.object(cache, "set") as cache_set,
+            mock.patch.object(cache, "add") as cache_add,
+        ):
+            response = self.client.get("/api/events")
+        self.assertEqual(response["X-Cache"], "HIT")
+        cache_set.assert_not_called()
+        cache_add.assert_not_called()
+        after = cache_stats()
+        self.assertEqual(after["hits"] - before["hits"], 1)
+        self.assertEqual(after["misses"] - before["misses"], 1)
+
+    def test_validators_answer_not_modified(self):
+        response = self.client.get("/api/events")
+        self.assertEqual(response.status_code, 200)
+        etag = response["ETag"]
+        last_modified = response["Last-Modified"]
+        self.assertEqual(
+            parse_http_date(last_modified),
+            get_events_version() // 10**9,
+        )
+
+        response = self.client.get("/api/events", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+        self.assertEqual(response["ETag"], etag)
+        response = self.client.get(
+            "/api/events",
+            HTTP_IF_MODIFIED_SINCE=last_modified,
+        )
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(
+            "/api/events",
+            HTTP_IF_NONE_MATCH='"stale"',
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_event_and_venue_saves_bump_the_version(self):
+        etag = self.client.get("/api/events")["ETag"]
+        event = Event.objects.get()
+        for instance, field, value in (
+            (event, "name", "Перенесённый концерт"),
+            (Venue.objects.create(name="Hall"), "name", "Main hall"),
+        ):
+            with self.subTest(model=type(instance).__name__):
+                version = get_events_version()
+                with self.captureOnCommitCallbacks(execute=True):
+                    setattr(instance, field, value)
+                    instance.save()
+                self.assertGreater(get_events_version(), version)
+
+        response = self.client.get("/api/events", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(
+            response.json()["results"][0]["name"],
+            "Перенесённый концерт",
+        )
+
+    def test_sync_bumps_the_version_only_when_events_change(self):
+        event = {
+            "id": str(uuid.UUID(int=7)),
+            "name": "Synced",
+            "event_time": "2030-02-01T10:00:00Z",
+            "status": "open",
+        }
+        with ProviderStubServer([event]) as stub:
+            for changed in (True, False):
+                version = get_events_version()
+                with self.captureOnCommitCallbacks(execute=True):
+                    call_command(
+                        "sync_events",
+                        "--all",
+                        provider_url=stub.url,
+                        stdout=StringIO(),
+                    )
+                self.assertEqual(get_events_version() > version, changed)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class EventKeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("keyset")
+        start = datetime(2030, 1, 1, tzinfo=timezone.utc)
+        # Pairs share an event_time, so pages split ties on id.
+        Event.objects.bulk_create([
+            Event(
+                id=uuid.UUID(int=100 - index),
+                name=f"Event {index}",
+                event_time=start + timedelta(hours=index // 2),
+            )
+            for index in range(7)
+        ])
+
+    def setUp(self):
+        caches[CACHE_ALIAS].clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def walk(self, url: str, link: str) -> list:
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append([item["id"] for item in response.json()["results"]])
+            url = response.json()[link]
+        return pages
+
+    def expected(self, *ordering) -> list:
+        ids = [
+            str(pk) for pk in
+            Event.objects.order_by(*ordering).values_list("id", flat=True)
+        ]
+        return [ids[start:start + 3] for start in range(0, len(ids), 3)]
+
+    def test_cursor_round_trip(self):
+        forward = self.walk(
+            "/api/events?pagination=cursor&page_size=3",
+            "next",
+        )
+        self.assertEqual(forward, self.expected("event_time", "id"))
+        last_page = self.client.get(
+            "/api/events?pagination=cursor&page_size=3"
+        ).json()
+        while last_page["next"]:
+            last_page = self.client.get(last_page["next"]).json()
+        self.assertIsNone(last_page["next"])
+        back = self.walk(last_page["previous"], "previous")
+        # Going back from the last page realigns pages on it.
+        ids = [pk for page in forward for pk in page]
+        self.assertEqual(
+            [pk for page in reversed(back) for pk in page],
+            ids[:-len(last_page["results"])],
+        )
+
+    def test_descending_cursor(self):
+        self.assertEqual(
+            self.walk(
+                "/api/events?pagination=cursor&page_size=3"
+                "&ordering=-event_time",
+                "next",
+            ),
+            self.expected("-event_time", "-id"),
+        )
+
+    def test_bad_cursor_is_not_found(self):
+        for cursor in ("garbage", "eyJ0IjoieCJ9", "e30="):
+            with self.subTest(cursor=cursor):
+                response = self.client.get(f"/api/events?cursor={cursor}")
+                self.assertEqual(response.status_code, 404)
+                self.assertEqual(
+                    response.json(),
+                    {"detail": "Invalid cursor"},
+                )
+
+
+class EventSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        start = datetime(2030, 1, 1, tzinfo=timezone.utc)
+        cls.events = {
+            name: Event.objects.create(name=name, event_time=start)
+            for name in (
+                "Большой Концерт",
+                "Jazz Night",
+                "Концертный зал: jazz",
+                "Опера",
+            )
+        }
+
+    def names(self, query, available=None) -> set:
+        return set(
+            search_events(Event.objects.all(), query, available)
+            .values_list("name", flat=True)
+        )
+
+    def test_index_is_available_and_cached(self):
+        self.assertTrue(is_available())
+        with self.assertNumQueries(0):
+            self.assertTrue(is_available())
+
+    def test_index_and_fallback_match_the_same_substrings(self):
+        for query, expected in (
+            ("онцер", {"Большой Концерт", "Концертный зал: jazz"}),
+            ("КОНЦЕРТ", {"Большой Концерт", "Концертный зал: jazz"}),
+            ("jazz концерт", {"Концертный зал: jazz"}),
+            ("ight", {"Jazz Night"}),
+            ("AZ", {"Jazz Night", "Концертный зал: jazz"}),
+            ("jazz ni", {"Jazz Night"}),
+            ("балет", set()),
+        ):
+            for available in (None, False):
+                with self.subTest(query=query, available=available):
+                    self.assertEqual(self.names(query, available), expected)
+
+    def test_results_are_ranked(self):
+        results = search_events(Event.objects.all(), "jazz")
+        self.assertTrue(all(event.search_rank > 0 for event in results))
+
+    def test_index_follows_updates_and_deletes(self):
+        event = self.events["Опера"]
+        event.name = "Рок-опера"
+        event.save()
+        self.assertEqual(self.names("рок"), {"Рок-опера"})
+        Event.objects.filter(name="Jazz Night").delete()
+        self.assertEqual(self.names("jazz"), {"Концертный зал: jazz"})
+        Event.objects.create(
+            name="Jazz Brunch",
+            event_time=datetime(2030, 1, 2, tzinfo=timezone.utc),
+        )
+        self.assertEqual(
+            self.names("jazz"),
+            {"Концертный зал: jazz", "Jazz Brunch"},
+        )
+
+
+class ExplainQueriesTests(TestCase):
+    def test_canonical_queries_pass_the_audit(self):
+        output = StringIO()
+        call_command("explain_queries", stdout=output)
+        self.assertIn("list search: known full walk", output.getvalue())
+        self.assertIn("No sequential scans", output.getvalue())
+
+    def test_sqlite_index_walks(self):
+        plan = (
+            "3 0 0 SCAN events_event USING INDEX event_time_id_idx\n"
+            "9 0 0 SCAN events_venue USING COVERING INDEX venue_name_idx\n"
+            "12 0 0 SEARCH events_event USING INDEX "
+            "event_status_time_idx (status=?)\n"
+            "20 0 0 SCAN events_event_fts VIRTUAL TABLE INDEX 0:M1"
+        )
+        self.assertEqual(
+            index_walks(plan, "sqlite"),
+            ["events_event", "events_venue"],
+        )
+
+    def test_postgresql_index_walks(self):
+        plan = (
+            "Limit  (cost=0.28..1.02 rows=10 width=8)\n"
+            "  ->  Nested Loop Left Join  (cost=0.28..9.1 rows=120 width=8)\n"
+            "        ->  Index Scan using event_time_id_idx on events_event"
+            "  (cost=0.14..5.2 rows=120 width=8)\n"
+            "              Filter: ((name)::text ~~* '%conc%'::text)\n"
+            "        ->  Index Only Scan using events_venue_pkey on "
+            "events_venue  (cost=0.14..0.2 rows=1 width=8)\n"
+            "              Index Cond: (id = events_event.venue_id)"
+        )
+        self.assertEqual(index_walks(plan, "postgresql"), ["events_event"])
+
+
+@override_settings(ROOT_URLCONF=__name__, CACHES=LOCMEM_CACHES)
+class AsyncViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.event = Event.objects.create(
+            name="Концерт",
+            event_time=datetime(2030, 1, 1, tzinfo=timezone.utc),
+        )
+        user = User.objects.create_user("async")
+        cls.auth = {"Authorization": f"Bearer {AccessToken.for_user(user)}"}
+        cls.register_url = f"/api/events/{cls.event.id}/register"
+
+    def setUp(self):
+        caches[CACHE_ALIAS].clear()
+
+    def assertJson(self, response, status: int):
+        self.assertEqual(response.status_code, status)
+        self.assertEqual(response["Content-Type"], "application/json")
+        return response.json()
+
+    async def register(self, **data):
+        return await self.async_client.post(
+            self.register_url,
+            {"full_name": "Guest", "email": "guest@example.com", **data},
+            content_type="application/json",
+        )
+
+    async def test_list(self):
+        response = await self.async_client.get(
+            "/api/events",
+            headers=self.auth,
+        )
+        body = self.assertJson(response, 200)
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(
+            [item["id"] for item in body["results"]],
+            [str(self.event.id)],
+        )
+
+    async def test_list_requires_authentication(self):
+        for headers in ({}, {"Authorization": "Bearer not-a-token"}):
+            with self.subTest(headers=headers):
+                response = await self.async_client.get(
+                    "/api/events",
+                    headers=headers,
+                )
+                body = self.assertJson(response, 401)
+                self.assertIn("detail", body)
+                self.assertTrue(response["WWW-Authenticate"])
+
+    async def test_register(self):
+        body = self.assertJson(await self.register(), 201)
+        self.assertEqual(body, {"message": REGISTERED})
+        self.assertEqual(await OutboxMessage.objects.acount(), 1)
+
+    async def test_register_duplicate(self):
+        self.assertJson(await self.register(), 201)
+        body = self.assertJson(await self.register(full_name="Again"), 400)
+        self.assertEqual(body, {"non_field_errors": [DUPLICATE_REGISTRATION]})
+
+    async def test_register_invalid(self):
+        body = self.assertJson(await self.register(email="nope"), 400)
+        self.assertEqual(list(body), ["email"])
+        self.assertEqual(await EventRegistration.objects.acount(), 0)
+
+    async def test_register_unknown_event(self):
+        self.register_url = f"/api/events/{uuid.UUID(int=1)}/register"
+        self.assertJson(await self.register(), 404)
+
+
+class EventRegisterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.event = Event.objects.create(
+            name="Концерт",
+            event_time=datetime(2030, 1, 1, tzinfo=timezone.utc),
+        )
+        cls.url = f"/api/events/{cls.event.id}/register"
+
+    def register(self, email="guest@example.com"):
+        return APIClient().post(
+            self.url,
+            {"full_name": "Guest", "email": email},
+            format="json",
+        )
+
+    def test_registration_is_one_transaction(self):
+        # The event lookup, then both INSERTs in one transaction.
+        with self.assertNumQueries(5):
+            response = self.register()
+        self.assertEqual(response.status_code, 201)
+        # The email is sent later by the outbox relay.
+        self.assertEqual(
+            response.data,
+            {"message": "Registration successful, confirmation email queued."},
+        )
+        registration = EventRegistration.objects.get()
+        message = OutboxMessage.objects.get()
+        self.assertEqual(message.topic, notifications.CONFIRMATION_TOPIC)
+        self.assertEqual(
+            message.payload["registration_id"],
+            str(registration.id),
+        )
+
+    def test_duplicate_email_is_rejected_by_the_constraint(self):
+        self.assertEqual(self.register().status_code, 201)
+        response = self.register()
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.data,
+            {
+                "non_field_errors": [
+                    "This email is already registered for this event."
+                ]
+            },
+        )
+        self.assertEqual(EventRegistration.objects.count(), 1)
+        self.assertEqual(OutboxMessage.objects.count(), 1)
+
+
+class RegistrationImportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.event = Event.objects.create(
+            name="Концерт",
+            event_time=datetime(2030, 1, 1, tzinfo=timezone.utc),
+        )
+        EventRegistration.objects.create(
+            event=cls.event,
+            full_name="Old Guest",
+            email="old@example.com",
+            confirmation_code="ABC123",
+        )
+        cls.url = f"/api/events/{cls.event.id}/registrations/import"
+        cls.lines = [
+            '{"full_name": "Anna", "email": "anna@example.com"}',
+            '{"full_name": "Anna again", "email": "anna@example.com"}',
+            '{"full_name": "Old Guest", "email": "old@example.com"}',
+            "",
+            '{"full_name": "Bob", "email": "not-an-email"}',
+            '{"full_name": " ", "email": "nobody@example.com"}',
+            "{broken",
+            "[1, 2]",
+            '{"full_name": "Carl", "email": "carl@example.com"}',
+        ]
+        cls.expected = [
+            (1, "anna@example.com", "created"),
+            (2, "anna@example.com", "duplicate"),
+            (3, "old@example.com", "duplicate"),
+            (4, "not-an-email", "invalid"),
+            (5, "nobody@example.com", "invalid"),
+            (6, "", "invalid"),
+            (7, "", "invalid"),
+            (8, "carl@example.com", "created"),
+        ]
+
+    def summary(self, results) -> list:
+        return [
+            (result["row"], result["email"], result["status"])
+            for result in results
+        ]
+
+    def test_results_per_row_in_input_order(self):
+        results = list(import_registrations(
+            self.event,
+            read_rows(self.lines, "jsonl"),
+            chunk_size=3,
+        ))
+        self.assertEqual(self.summary(results), self.expected)
+        self.assertEqual(
+            results[3]["errors"],
+            ["Enter a valid email address."],
+        )
+        self.assertEqual(results[4]["errors"], ["full_name is required."])
+        self.assertTrue(results[5]["errors"][0].startswith("Invalid JSON"))
+        self.assertEqual(results[6]["errors"], ["Expected a JSON object."])
+        self.assertCountEqual(
+            OutboxMessage.objects.values_list("payload__email", flat=True),
+            ["anna@example.com", "carl@example.com"],
+        )
+        self.assertEqual(
+            EventRegistration.objects.get(email="anna@example.com").full_name,
+            "Anna",
+        )
+
+    def test_closed_event_rejects_every_row(self):
+        self.event.status = Event.Status.CLOSED
+        self.event.save()
+        results = list(import_registrations(
+            self.event,
+            read_rows(self.lines[:2], "jsonl"),
+        ))
+        self.assertEqual(
+            [result["status"] for result in results],
+            ["invalid", "invalid"],
+        )
+        self.assertEqual(
+            results[0]["errors"],
+            ["Registration is closed for this event."],
+        )
+        self.assertFalse(OutboxMessage.objects.exists())
+
+    def test_api_streams_csv_results_for_admins(self):
+        client = APIClient()
+        body = (
+            "\ufefffull_name,email\r\n"
+            "Dana,dana@example.com\r\n"
+            "Old Guest,old@example.com\r\n"
+            "Eve,\r\n"
+        )
+        client.force_authenticate(User.objects.create_user("user"))
+        response = client.post(self.url, body, content_type="text/csv")
+        self.assertEqual(response.status_code, 403)
+
+        client.force_authenticate(
+            User.objects.create_user("admin", is_staff=True)
+        )
+        response = client.post(self.url, body, content_type="text/csv")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        results = [
+            json.loads(line)
+            for line in b"".join(response.streaming_content).splitlines()
+        ]
+        self.assertEqual(
+            self.summary(results),
+            [
+                (1, "dana@example.com", "created"),
+                (2, "old@example.com", "duplicate"),
+                (3, "", "invalid"),
+            ],
+        )
+
+    def test_command_writes_results_and_summary(self):
+        with tempfile.NamedTemporaryFile(
+            "w",
+            suffix=".jsonl",
+            encoding="utf-8",
+        ) as source:
+            source.write("\n".join(self.lines))
+            source.flush()
+            stdout, stderr = StringIO(), StringIO()
+            with CaptureQueriesContext(connection) as queries:
+                call_command(
+                    "import_registrations",
+                    str(self.event.id),
+                    source.name,
+                    stdout=stdout,
+                    stderr=stderr,
+                )
+        results = [json.loads(line) for line in stdout.getvalue().splitlines()]
+        self.assertEqual(self.summary(results), self.expected)
+        self.assertIn(
+            f"Imported {self.event.name} ({self.event.id}): "
+            "created: 2, duplicate: 2, invalid: 4",
+            stderr.getvalue(),
+        )
+        # The event is loaded once, without the deferred fields.
+        self.assertEqual(
+            sum(
+                'FROM "events_event"' in query["sql"]
+                for query in queries.captured_queries
+            ),
+            1,
+        )
+
+
+class NotificationsClientTests(SimpleTestCase):
+    def setUp(self):
+        self.stub = NotificationsStubServer().start()
+        self.addCleanup(self.stub.stop)
+
+    def make_client(self, **options):
+        client = notifications.NotificationsClient(
+            url=self.stub.url,
+            token="token",
+            max_in_flight=4,
+            **options
+        )
+        self.addCleanup(client.close)
+        return client
+
+    def payloads(self, count):
+        return [
+            {"email": f"guest{index}@example.com", "message": "hi"}
+            for index in range(count)
+        ]
+
+    def test_send_many_reuses_pooled_connections(self):
+        self.stub.fail_emails = {"guest3@example.com"}
+        with self.assertLogs("events.notifications", "ERROR"):
+            errors = self.make_client().send_many(self.payloads(40))
+        self.assertEqual(len(self.stub.requests), 40)
+        self.assertLessEqual(
+            len({port for _, _, port in self.stub.requests}),
+            4,
+        )
+        self.assertEqual(
+            [index for index, error in enumerate(errors) if error],
+            [3],
+        )
+
+    def test_submit_coalesces_into_batch_requests(self):
+        client = self.make_client(
+            batch_url=self.stub.batch_url,
+            batch_size=25,
+            batch_window=0.5,
+        )
+        futures = [client.submit(payload) for payload in self.payloads(50)]
+        self.assertEqual([f.result(timeout=5) for f in futures], [None] * 50)
+        self.assertEqual(
+            [len(body) for _, body, _ in self.stub.requests],
+            [25, 25],
+        )
+        self.assertEqual(len(self.stub.emails), 50)
+
+    def test_submit_without_batch_url_sends_right_away(self):
+        client = self.make_client(batch_url=None, batch_window=30)
+        started = time.monotonic()
+        futures = [client.submit(payload) for payload in self.payloads(10)]
+        self.assertEqual([f.result(timeout=5) for f in futures], [None] * 10)
+        self.assertLess(time.monotonic() - started, 5)
+        self.assertEqual(
+            {path for path, _, _ in self.stub.requests},
+            {"/api/notifications"},
+        )
+        self.assertEqual(len(self.stub.requests), 10)
+
+    def test_publisher_reports_failed_messages(self):
+        self.stub.fail_emails = {"guest1@example.com"}
+        publisher = notifications.ConfirmationEmailPublisher(url=self.stub.url)
+        self.addCleanup(publisher.close)
+        messages = [
+            OutboxMessage(
+                topic=notifications.CONFIRMATION_TOPIC,
+                payload={**payload, "subject": "s"},
+            )
+            for payload in self.payloads(3)
+        ]
+        with self.assertLogs("events.notifications", "ERROR"):
+            errors = publisher.publish(messages)
+        self.assertEqual(list(errors), [messages[1].id])
+        body = self.stub.requests[0][1]
+        self.assertEqual(body["owner_id"], publisher.client.owner_id)
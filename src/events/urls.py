@@ -1,12 +1,26 @@
+from django.conf import settings
 from django.urls import path
 
-from .views import EventListAPIView, EventRegisterAPIView
+from . import async_views, views
+
+if getattr(settings, "EVENTS_ASYNC_VIEWS", False):
+    # Native async views for ASGI deployments (core.asgi).
+    list_view = async_views.AsyncEventListView
+    register_view = async_views.AsyncEventRegisterView
+else:
+    list_view = views.EventListAPIView
+    register_view = views.EventRegisterAPIView
 
 urlpatterns = [
-    path("events", EventListAPIView.as_view(), name="api-events-list"),
+    path("events", list_view.as_view(), name="api-events-list"),
     path(
         "events/<uuid:event_id>/register",
-        EventRegisterAPIView.as_view(),
+        register_view.as_view(),
         name="api-events-register"
     ),
+    path(
+        "events/<uuid:event_id>/registrations/import",
+        views.EventRegistrationImportAPIView.as_view(),
+        name="api-events-registrations-import"
+    ),
 ]
@@ -1,10 +1,4 @@
-import os
-
-import requests
-
-NOTIFICATIONS_URL = "https://notifications.k3scluster.tech/api/notifications/"
-NOTIFICATIONS_TOKEN = os.environ['NOTIFICATIONS_TOKEN']
-OWNER_ID = os.environ['OWNER_ID']
+from .notifications import confirmation_content, get_client
 
 
 def send_confirmation_email(
@@ -13,20 +7,13 @@ def send_confirmation_email(
         confirmation_code: str,
         event_name: str
      ) -> bool:
-    payload = {
-        "owner_id": OWNER_ID,
-        "email": email,
-        "subject": f"Регистрация на мероприятие: {event_name}",
-        "message": f"Здравствуйте, {full_name}!\n\n"
-        f"Ваш код подтверждения: {confirmation_code}\n\n"
-        "Спасибо за регистрацию!"
-    }
-
-    headers = {
-        "Authorization": f"Bearer {NOTIFICATIONS_TOKEN}",
-        "Content-Type": "application/json",
-    }
-
-    response = requests.post(NOTIFICATIONS_URL, json=payload, headers=headers)
-
-    return response.status_code == 200
+    """
+    Send one confirmation email and wait for the result. Concurrent
+    callers share the pooled ``NotificationsClient`` and are coalesced
+    into batches.
+    """
+    client = get_client()
+    payload = client.email_payload(
+        **confirmation_content(email, full_name, confirmation_code, event_name)
+    )
+    return client.submit(payload).result() is None
@@ -1,22 +1,28 @@
+import codecs
+import functools
+import hashlib
+import json
 import uuid
 
-import requests
 from django.db import transaction
+from django.http import HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import filters, generics, permissions, status
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 from rest_framework.views import APIView
 
 from outbox.models import OutboxMessage
 
-from .models import Event, EventRegistration
-from .serializers import EventRegistrationSerializer, EventSerializer
-
-NOTIFICATIONS_API_URL = (
-    "https://notifications.k3scluster.tech/api/notifications"
-    )
-OWNER_ID = "3fa85f64-5717-4562-b3fc-2c963f66afa7"
+from . import cache, serializers
+from .models import Event
+from .pagination import EventKeysetPagination
+from .registrations import import_registrations, read_rows, register
+from .search import EventSearchFilter
 
 
 @transaction.atomic
@@ -43,12 +49,46 @@ def create_event(request):
     return Response({"status": "created", "event_id": event.id})
 
 
+DUPLICATE_REGISTRATION = "This email is already registered for this event."
+REGISTERED = "Registration successful, confirmation email queued."
+
+
+@functools.cache
+def lean_event_serializer() -> serializers.LeanEventSerializer:
+    return serializers.LeanEventSerializer(serializers.EventSerializer)
+
+
+def list_cache_entry(data, version: int) -> dict:
+    """Render ``data`` once; the bytes are both cached and hashed."""
+    content = JSONRenderer().render(data)
+    return {
+        "content": content,
+        "etag": quote_etag(
+            hashlib.md5(content, usedforsecurity=False).hexdigest()
+        ),
+        "last_modified": cache.version_last_modified(version).timestamp(),
+    }
+
+
+def list_content_response(entry: dict) -> HttpResponse:
+    # Already rendered once; serve the bytes as they are.
+    return HttpResponse(entry["content"], content_type=JSONRenderer.media_type)
+
+
+def finalize_list_response(response, entry: dict, cache_status: str):
+    response["ETag"] = entry["etag"]
+    response["Last-Modified"] = http_date(entry["last_modified"])
+    response["X-Cache"] = cache_status
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
 class EventListAPIView(generics.ListAPIView):
-    serializer_class = EventSerializer
+    serializer_class = serializers.EventSerializer
     filter_backends = [
         DjangoFilterBackend,
-        filters.SearchFilter,
-        filters.OrderingFilter
+        filters.OrderingFilter,
+        EventSearchFilter,
     ]
     search_fields = ["name"]
     ordering_fields = ["event_time"]
@@ -62,14 +102,69 @@ class EventListAPIView(generics.ListAPIView):
         )
         return qs
 
+    @property
+    def paginator(self):
+        """
+        Page numbers by default; keyset pagination when the client opts in
+        with ``?pagination=cursor`` (see ``EventKeysetPagination``).
+        """
+        if not hasattr(self, "_paginator"):
+            if EventKeysetPagination.requested(self.request):
+                self._paginator = EventKeysetPagination()
+            else:
+                self._paginator = super().paginator
+        return self._paginator
+
+    def lean_list(self):
+        """
+        ``ListAPIView.list`` on ``values()`` rows through
+        ``LeanEventSerializer``; returns the response data.
+        """
+        serializer = lean_event_serializer()
+        queryset = serializer.values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(serializer.many(page)).data
+        return serializer.many(queryset)
+
+    def list(self, request, *args, **kwargs):
+        """
+        Serve the page from the events cache, keyed by the normalized
+        query and the global events version, and answer conditional
+        requests with ``304 Not Modified``.
+        """
+        version = cache.get_events_version()
+        key = cache.list_cache_key(request, version)
+        entry = cache.get_cached_list(key)
+        cache_status = "HIT"
+        if entry is None:
+            cache_status = "MISS"
+            entry = list_cache_entry(self.lean_list(), version)
+            cache.set_cached_list(key, entry)
+
+        response = get_conditional_response(
+            request._request,
+            etag=entry["etag"],
+            last_modified=entry["last_modified"],
+        )
+        if response is None:
+            if request.accepted_media_type == JSONRenderer.media_type:
+                response = list_content_response(entry)
+            else:
+                response = Response(json.loads(entry["content"]))
+        return finalize_list_response(response, entry, cache_status)
+
 
 class EventRegisterAPIView(APIView):
     permission_classes = [permissions.AllowAny]
 
     def post(self, request, event_id):
-        event = get_object_or_404(Event, id=event_id)
+        event = get_object_or_404(
+            Event.objects.only("id", "name", "status"),
+            id=event_id,
+        )
 
-        serializer = EventRegistrationSerializer(
+        serializer = serializers.EventRegistrationSerializer(
             data=request.data, context={"event": event}
         )
         serializer.is_valid(raise_exception=True)
@@ -77,37 +172,45 @@ class EventRegisterAPIView(APIView):
         full_name = serializer.validated_data["full_name"]
         email = serializer.validated_data["email"]
 
-        if EventRegistration.objects.filter(event=event, email=email).exists():
+        if register(event, full_name, email) is None:
             return Response(
-                {"error": "This email is already registered for this event."},
+                {
+                    api_settings.NON_FIELD_ERRORS_KEY: [
+                        DUPLICATE_REGISTRATION
+                    ]
+                },
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        confirmation_code = uuid.uuid4().hex[:6].upper()
-
-        payload = {
-            "owner_id": OWNER_ID,
-            "email": email,
-            "subject": f"Регистрация на мероприятие: {event.name}",
-            "message": (
-                f"Здравствуйте, {full_name}!\n\nВаш код подтверждения: "
-                f"{confirmation_code}\n\nСпасибо за регистрацию!"
-            ),
-        }
-        try:
-            resp = requests.post(NOTIFICATIONS_API_URL, json=payload)
-            if resp.status_code != 200:
-                return Response(
-                    {"error": "Failed to send confirmation email."},
-                    status=status.HTTP_502_BAD_GATEWAY,
-                )
-        except requests.RequestException:
-            return Response(
-                {"error": "Failed to connect to notification service."},
-                status=status.HTTP_502_BAD_GATEWAY,
-            )
-
         return Response(
-            {"message": "Registration successful, confirmation code sent."},
+            {"message": REGISTERED},
             status=status.HTTP_201_CREATED,
         )
+
+
+class EventRegistrationImportAPIView(APIView):
+    """
+    Bulk registration from a partner spreadsheet: the request body is CSV
+    (``text/csv``, header with ``full_name`` and ``email``) or JSON Lines
+    (any other content type). The body is read line by line and the
+    response streams one JSON result per input row, so neither side is
+    held in memory.
+    """
+
+    permission_classes = [permissions.IsAdminUser]
+
+    def post(self, request, event_id):
+        event = get_object_or_404(
+            Event.objects.only("id", "name", "status"),
+            id=event_id,
+        )
+        fmt = "jsonl"
+        if request.content_type.startswith("text/csv"):
+            fmt = "csv"
+        lines = codecs.iterdecode(request._request, "utf-8-sig")
+        results = import_registrations(event, read_rows(lines, fmt))
+        return StreamingHttpResponse(
+            (json.dumps(result, ensure_ascii=False) + "\n"
+             for result in results),
+            content_type="application/x-ndjson",
+        )
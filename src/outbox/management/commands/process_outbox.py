@@ -1,11 +1,12 @@
-import json
 import logging
-import time
+import threading
 
-from django.core.management.base import BaseCommand
-from django.db import transaction
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
 
-from outbox.models import OutboxMessage
+from outbox.models import PARTITIONS
+from outbox.publishers import get_publisher
+from outbox.relay import OutboxRelay, default_worker_id, get_waiter
 
 logger = logging.getLogger(__name__)
 
@@ -13,27 +14,118 @@ logger = logging.getLogger(__name__)
 class Command(BaseCommand):
     help = "Send unsent messages from Outbox (Transactional Outbox pattern)"
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=100,
+            help="Messages claimed and marked as sent per batch "
+            "(default 100)",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=0.05,
+            help="Initial seconds to wait once the outbox has been drained; "
+            "doubles while idle (default 0.05)",
+        )
+        parser.add_argument(
+            "--max-poll-interval",
+            type=float,
+            default=5.0,
+            help="Upper bound for the idle wait. On PostgreSQL the relay "
+            "sleeps until NOTIFY, the next retry or this timeout "
+            "(default 5.0)",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Number of relay worker threads; each owns a disjoint set "
+            "of partitions (default 1)",
+        )
+
     def handle(self, *args, **options):
-        self.stdout.write(self.style.SUCCESS("Starting Outbox Relay..."))
-
-        while True:
-            with transaction.atomic():
-                messages = (
-                    OutboxMessage.objects
-                    .filter(sent=False)
-                    .select_for_update(skip_locked=True)
-                    .order_by("created_at")[:100]
+        batch_size = options["batch_size"]
+        poll_interval = options["poll_interval"]
+        max_poll_interval = options["max_poll_interval"]
+        workers = options["workers"]
+        if batch_size < 1:
+            raise CommandError("--batch-size must be a positive integer.")
+        if poll_interval < 0 or max_poll_interval < 0:
+            raise CommandError("Poll intervals must not be negative.")
+        if not 1 <= workers <= PARTITIONS:
+            raise CommandError(
+                f"--workers must be between 1 and {PARTITIONS}."
+            )
+
+        try:
+            publisher = get_publisher()
+        except (ImportError, TypeError, ValueError) as exc:
+            raise CommandError(f"Invalid outbox publisher settings: {exc}")
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Starting Outbox Relay with {workers} worker(s)..."
+            )
+        )
+
+        stop = threading.Event()
+        try:
+            if workers == 1:
+                OutboxRelay(publisher, batch_size).run(
+                    get_waiter(poll_interval, max_poll_interval),
+                    stop,
+                )
+            else:
+                self.run_workers(
+                    publisher,
+                    batch_size,
+                    (poll_interval, max_poll_interval),
+                    workers,
+                    stop,
                 )
+        finally:
+            stop.set()
+            publisher.close()
 
-                for msg in messages:
-                    try:
-                        print(
-                            f"Sending topic={msg.topic} payload="
-                            f"{json.dumps(msg.payload, ensure_ascii=False)}"
-                        )
+    def run_workers(self, publisher, batch_size, intervals, workers, stop):
+        failures = []
 
-                        msg.mark_as_sent()
-                    except Exception as e:
-                        logger.error(f"Failed to process {msg.id}: {e}")
+        def work(index):
+            partitions = list(range(index, PARTITIONS, workers))
+            relay = OutboxRelay(
+                publisher,
+                batch_size,
+                partitions=partitions,
+                worker_id=default_worker_id(index),
+            )
+            try:
+                relay.run(get_waiter(*intervals, partitions=partitions), stop)
+            except Exception as exc:
+                logger.exception("Outbox worker %d failed", index)
+                failures.append(exc)
+                stop.set()
+            finally:
+                connection.close()
 
-            time.sleep(1)
+        threads = [
+            threading.Thread(
+                target=work,
+                args=(index,),
+                name=f"outbox-relay-{index}",
+            )
+            for index in range(workers)
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            while any(thread.is_alive() for thread in threads):
+                for thread in threads:
+                    thread.join(timeout=1)
+        except KeyboardInterrupt:
+            stop.set()
+            for thread in threads:
+                thread.join()
+        if failures:
+            raise CommandError(f"Outbox worker failed: {failures[0]}")
@@ -0,0 +1,144 @@
+import gzip
+import json
+import logging
+import os
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from outbox.models import OutboxMessage
+
+logger = logging.getLogger(__name__)
+
+
+ARCHIVE_DIR = getattr(
+    settings,
+    "OUTBOX_ARCHIVE_DIR",
+    Path(settings.BASE_DIR) / "outbox_archive",
+)
+ARCHIVE_FIELDS = (
+    "id",
+    "topic",
+    "payload",
+    "created_at",
+    "sent_at",
+    "attempts",
+    "last_error",
+    "dead_letter",
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Archive sent Outbox messages older than --days and dead-lettered "
+        "ones older than --dead-letter-days to a gzipped JSONL file and "
+        "delete them in bounded batches."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=30,
+            help="Prune messages sent more than this many days ago "
+            "(default 30)",
+        )
+        parser.add_argument(
+            "--dead-letter-days",
+            type=int,
+            default=90,
+            help="Prune dead-lettered messages created more than this many "
+            "days ago (default 90)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Rows archived and deleted per batch (default 1000)",
+        )
+        parser.add_argument(
+            "--archive-dir",
+            type=str,
+            default=str(ARCHIVE_DIR),
+            help="Directory for archive files",
+        )
+        parser.add_argument(
+            "--no-archive",
+            action="store_true",
+            help="Delete without writing an archive",
+        )
+
+    def handle(self, *args, **options):
+        days = options["days"]
+        dead_letter_days = options["dead_letter_days"]
+        batch_size = options["batch_size"]
+        if days < 0 or dead_letter_days < 0:
+            raise CommandError(
+                "--days and --dead-letter-days must not be negative."
+            )
+        if batch_size < 1:
+            raise CommandError("--batch-size must be a positive integer.")
+
+        now = timezone.now()
+        sent = OutboxMessage.objects.filter(
+            sent=True,
+            sent_at__lt=now - timedelta(days=days),
+        ).order_by("sent_at")
+        dead = OutboxMessage.objects.filter(
+            dead_letter=True,
+            created_at__lt=now - timedelta(days=dead_letter_days),
+        ).order_by("created_at")
+
+        self.archive = None
+        self.archive_path = None
+        if not options["no_archive"]:
+            archive_dir = Path(options["archive_dir"])
+            archive_dir.mkdir(parents=True, exist_ok=True)
+            self.archive_path = archive_dir / (
+                f"outbox-{now.strftime('%Y%m%dT%H%M%S')}.jsonl.gz"
+            )
+
+        try:
+            pruned_sent = self.prune(sent, batch_size)
+            pruned_dead = self.prune(dead, batch_size)
+        finally:
+            if self.archive is not None:
+                self.archive.close()
+
+        pruned = pruned_sent + pruned_dead
+        if pruned and self.archive_path is not None:
+            self.stdout.write(f"Archived to {self.archive_path}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Pruned {pruned} outbox messages "
+                f"({pruned_dead} dead-lettered)."
+            )
+        )
+
+    def prune(self, expired, batch_size: int) -> int:
+        pruned = 0
+        while True:
+            rows = list(expired.values(*ARCHIVE_FIELDS)[:batch_size])
+            if not rows:
+                return pruned
+            if self.archive_path is not None:
+                self.write_archive(rows)
+            OutboxMessage.objects.filter(
+                id__in=[row["id"] for row in rows]
+            ).delete()
+            pruned += len(rows)
+
+    def write_archive(self, rows: list) -> None:
+        if self.archive is None:
+            self.archive = gzip.open(self.archive_path, "at", encoding="utf-8")
+        for row in rows:
+            self.archive.write(
+                json.dumps(row, ensure_ascii=False, default=str) + "\n"
+            )
+        # The batch must be on disk before its rows are deleted: flush()
+        # only hands it to the OS, fsync() waits until it is durable.
+        self.archive.flush()
+        os.fsync(self.archive.fileno())
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:00
+
+import zlib
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def assign_partitions(apps, schema_editor):
+    OutboxMessage = apps.get_model("outbox", "OutboxMessage")
+    partitions = getattr(settings, "OUTBOX_PARTITIONS", 64)
+    pending = OutboxMessage.objects.filter(sent=False).only(
+        "id", "topic", "payload"
+    )
+    batch = []
+    for msg in pending.iterator(chunk_size=1000):
+        msg.key = msg.topic
+        if isinstance(msg.payload, dict) and msg.payload.get("event_id"):
+            msg.key = str(msg.payload["event_id"])
+        msg.partition = zlib.crc32(msg.key.encode()) % partitions
+        batch.append(msg)
+        if len(batch) >= 1000:
+            OutboxMessage.objects.bulk_update(batch, ["key", "partition"])
+            batch = []
+    if batch:
+        OutboxMessage.objects.bulk_update(batch, ["key", "partition"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('outbox', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outboxmessage',
+            name='claimed_by',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='outboxmessage',
+            name='claimed_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='outboxmessage',
+            name='key',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='outboxmessage',
+            name='partition',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.RunPython(assign_partitions, migrations.RunPython.noop),
+    ]
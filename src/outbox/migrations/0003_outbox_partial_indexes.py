@@ -0,0 +1,25 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('outbox', '0002_outbox_partitions_and_keys'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='outboxmessage',
+            name='outbox_outb_sent_4993d6_idx',
+        ),
+        migrations.AddIndex(
+            model_name='outboxmessage',
+            index=models.Index(
+                condition=models.Q(('sent', True)),
+                fields=['sent_at'],
+                name='outbox_sent_at_idx'
+            ),
+        ),
+    ]
@@ -0,0 +1,78 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:03
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import F
+
+
+def schedule_pending_messages(apps, schema_editor):
+    OutboxMessage = apps.get_model("outbox", "OutboxMessage")
+    OutboxMessage.objects.filter(sent=False).update(
+        next_attempt_at=F("created_at")
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('outbox', '0003_outbox_partial_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outboxmessage',
+            name='attempts',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='outboxmessage',
+            name='dead_letter',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='outboxmessage',
+            name='last_error',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='outboxmessage',
+            name='next_attempt_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddIndex(
+            model_name='outboxmessage',
+            index=models.Index(
+                condition=models.Q(('dead_letter', False), ('sent', False)),
+                fields=['created_at'],
+                name='outbox_pending_idx'
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='outboxmessage',
+            index=models.Index(
+                condition=models.Q(('dead_letter', False), ('sent', False)),
+                fields=['partition', 'created_at'],
+                name='outbox_pending_part_idx'
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='outboxmessage',
+            index=models.Index(
+                condition=models.Q(('dead_letter', False), ('sent', False)),
+                fields=['key', 'created_at'],
+                name='outbox_pending_key_idx'
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='outboxmessage',
+            index=models.Index(
+                condition=models.Q(('dead_letter', True)),
+                fields=['created_at'],
+                name='outbox_dead_created_idx'
+            ),
+        ),
+        migrations.RunPython(
+            schedule_pending_messages,
+            migrations.RunPython.noop,
+        ),
+    ]
@@ -1,8 +1,25 @@
+import random
 import uuid
+import zlib
+from datetime import timedelta
 
+from django.conf import settings
 from django.db import models
 from django.utils import timezone
 
+PARTITIONS = getattr(settings, "OUTBOX_PARTITIONS", 64)
+MAX_ATTEMPTS = getattr(settings, "OUTBOX_MAX_ATTEMPTS", 10)
+RETRY_BASE_SECONDS = getattr(settings, "OUTBOX_RETRY_BASE_SECONDS", 5)
+RETRY_MAX_SECONDS = getattr(settings, "OUTBOX_RETRY_MAX_SECONDS", 3600)
+RETRY_FIELDS = (
+    "attempts",
+    "next_attempt_at",
+    "last_error",
+    "dead_letter",
+    "claimed_by",
+    "claimed_until",
+)
+
 
 class OutboxMessage(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -11,12 +28,112 @@ class OutboxMessage(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     sent = models.BooleanField(default=False)
     sent_at = models.DateTimeField(null=True, blank=True)
+    key = models.CharField(max_length=255, blank=True)
+    partition = models.PositiveSmallIntegerField(default=0)
+    claimed_by = models.CharField(max_length=64, blank=True)
+    claimed_until = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    dead_letter = models.BooleanField(default=False)
 
     class Meta:
         indexes = [
-            models.Index(fields=["sent", "created_at"]),
+            models.Index(
+                fields=["created_at"],
+                condition=models.Q(sent=False, dead_letter=False),
+                name="outbox_pending_idx",
+            ),
+            models.Index(
+                fields=["partition", "created_at"],
+                condition=models.Q(sent=False, dead_letter=False),
+                name="outbox_pending_part_idx",
+            ),
+            models.Index(
+                fields=["key", "created_at"],
+                condition=models.Q(sent=False, dead_letter=False),
+                name="outbox_pending_key_idx",
+            ),
+            models.Index(
+                fields=["sent_at"],
+                condition=models.Q(sent=True),
+                name="outbox_sent_at_idx",
+            ),
+            models.Index(
+                fields=["created_at"],
+                condition=models.Q(dead_letter=True),
+                name="outbox_dead_created_idx",
+            ),
         ]
 
+    @staticmethod
+    def key_for(topic: str, payload) -> str:
+        """
+        Default ordering key: the event the message is about, else its
+        topic. Messages sharing a key are delivered in creation order.
+        """
+        if isinstance(payload, dict) and payload.get("event_id"):
+            return str(payload["event_id"])
+        return topic
+
+    @staticmethod
+    def partition_for(key: str) -> int:
+        """
+        Messages sharing a key share a partition, so only the relay worker
+        that owns the partition ever holds them. Within a batch the
+        publishers deliver them one after another (see
+        ``outbox.publishers.publish_in_order``), and a message waiting for
+        a retry holds back the ones after it (see ``OutboxRelay.pending``).
+        """
+        return zlib.crc32(key.encode()) % PARTITIONS
+
+    def assign_key(self) -> None:
+        """Fill in ``key``, unless set explicitly, and ``partition``."""
+        self.key = self.key or self.key_for(self.topic, self.payload)
+        self.partition = self.partition_for(self.key)
+
+    @classmethod
+    def bulk_enqueue(cls, messages: list, using: str = "default") -> list:
+        """
+        ``bulk_create`` for outbox messages: fills in ``key`` and
+        ``partition``, which ``save`` would have set, and wakes PostgreSQL
+        relays once per partition instead of once per message.
+        """
+        from .signals import notify_partitions
+
+        for msg in messages:
+            msg.assign_key()
+        created = cls.objects.using(using).bulk_create(messages)
+        notify_partitions(using, [msg.partition for msg in created])
+        return created
+
+    def save(self, *args, **kwargs):
+        if self._state.adding:
+            self.assign_key()
+        super().save(*args, **kwargs)
+
+    def schedule_retry(self, error: str, now=None) -> None:
+        """
+        Record a failed delivery: back off exponentially with jitter, or
+        move the message to the dead letter state once ``MAX_ATTEMPTS``
+        deliveries have failed, which stops it from holding back the later
+        messages of its key. The caller saves the row.
+        """
+        now = now or timezone.now()
+        self.attempts += 1
+        self.last_error = error[:2000]
+        self.claimed_by = ""
+        self.claimed_until = None
+        if self.attempts >= MAX_ATTEMPTS:
+            self.dead_letter = True
+            return
+        delay = min(
+            RETRY_BASE_SECONDS * 2 ** (self.attempts - 1),
+            RETRY_MAX_SECONDS,
+        )
+        delay *= random.uniform(0.5, 1.0)
+        self.next_attempt_at = now + timedelta(seconds=delay)
+
     def mark_as_sent(self):
         self.sent = True
         self.sent_at = timezone.now()
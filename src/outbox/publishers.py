@@ -0,0 +1,271 @@
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+import requests
+from django.conf import settings
+from django.utils.module_loading import import_string
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_PUBLISHERS = {
+    "default": {"BACKEND": "outbox.publishers.ConsolePublisher"},
+}
+MAX_IN_FLIGHT = getattr(settings, "OUTBOX_MAX_IN_FLIGHT", 8)
+SKIPPED = "Not sent: an earlier message with the same key failed."
+
+
+def envelope(msg) -> dict:
+    return {
+        "id": str(msg.id),
+        "topic": msg.topic,
+        "payload": msg.payload,
+        "created_at": msg.created_at.isoformat() if msg.created_at else None,
+    }
+
+
+def publish_in_order(messages: list, publish_round) -> dict:
+    """
+    Deliver a batch in rounds that hold at most one message per ``key``:
+    the first message of every key, then the second, and so on. Rounds
+    run one after another through ``publish_round`` (which returns the
+    ``publish`` errors of its round), so a publisher may deliver each
+    round concurrently and messages sharing a key still arrive in batch
+    order. Once a message fails, the rest of its key fail as ``SKIPPED``.
+    """
+    rounds = []
+    depth = {}
+    for msg in messages:
+        index = depth.get(msg.key, 0)
+        depth[msg.key] = index + 1
+        if index == len(rounds):
+            rounds.append([])
+        rounds[index].append(msg)
+
+    errors = {}
+    failed_keys = set()
+    for batch in rounds:
+        ready = []
+        for msg in batch:
+            if msg.key in failed_keys:
+                errors[msg.id] = SKIPPED
+            else:
+                ready.append(msg)
+        if not ready:
+            continue
+        round_errors = publish_round(ready)
+        errors.update(round_errors)
+        failed_keys.update(msg.key for msg in ready if msg.id in round_errors)
+    return errors
+
+
+class BasePublisher:
+    """
+    Delivers a batch of outbox messages.
+
+    ``publish`` returns ``{message_id: error}`` for the messages that
+    could not be delivered; every other message of the batch is marked as
+    sent by the relay, and the failed ones are scheduled for a retry.
+    Messages come in creation order, and those sharing a ``key`` must be
+    delivered in that order: publishers that deliver concurrently go
+    through ``publish_in_order``.
+    """
+
+    def __init__(self, max_in_flight: int = MAX_IN_FLIGHT, **options):
+        self.max_in_flight = max_in_flight
+
+    def publish(self, messages: list) -> dict:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class ConsolePublisher(BasePublisher):
+    def publish(self, messages: list) -> dict:
+        for msg in messages:
+            print(
+                f"Sending topic={msg.topic} payload="
+                f"{json.dumps(msg.payload, ensure_ascii=False)}"
+            )
+        return {}
+
+
+class InMemoryPublisher(BasePublisher):
+    """Collects envelopes in its ``outbox`` list, for tests."""
+
+    def __init__(self, **options):
+        super().__init__(**options)
+        self.outbox = []
+
+    def publish(self, messages: list) -> dict:
+        self.outbox.extend(envelope(msg) for msg in messages)
+        return {}
+
+
+class JsonlFilePublisher(BasePublisher):
+    """Appends one JSON line per message and fsyncs once per batch."""
+
+    def __init__(self, path: str, **options):
+        super().__init__(**options)
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def publish(self, messages: list) -> dict:
+        lines = "".join(
+            json.dumps(envelope(msg), ensure_ascii=False) + "\n"
+            for msg in messages
+        )
+        try:
+            with self._lock, self.path.open("a", encoding="utf-8") as fh:
+                fh.write(lines)
+                fh.flush()
+                os.fsync(fh.fileno())
+        except OSError as exc:
+            logger.exception("Failed to write outbox batch to %s", self.path)
+            return {msg.id: str(exc) for msg in messages}
+        return {}
+
+
+class WebhookPublisher(BasePublisher):
+    """
+    POSTs each message envelope to ``url`` over a pooled session, with at
+    most ``max_in_flight`` requests outstanding. Messages sharing a key
+    are posted one after another, each once the previous one succeeded.
+    """
+
+    def __init__(
+            self,
+            url: str,
+            timeout: float = 5,
+            headers: dict = None,
+            **options
+         ):
+        super().__init__(**options)
+        self.url = url
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=self.max_in_flight,
+            pool_maxsize=self.max_in_flight,
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update(headers or {})
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.max_in_flight,
+            thread_name_prefix="outbox-webhook",
+        )
+
+    def _post(self, msg) -> Optional[str]:
+        try:
+            resp = self.session.post(
+                self.url,
+                json=envelope(msg),
+                headers={"X-Outbox-Topic": msg.topic},
+                timeout=self.timeout,
+            )
+            resp.raise_for_status()
+        except requests.RequestException as exc:
+            logger.error(f"Failed to publish {msg.id} to {self.url}: {exc}")
+            return str(exc)
+        return None
+
+    def publish(self, messages: list) -> dict:
+        return publish_in_order(messages, self._publish_round)
+
+    def _publish_round(self, messages: list) -> dict:
+        errors = self.executor.map(self._post, messages)
+        return {
+            msg.id: error
+            for msg, error in zip(messages, errors)
+            if error is not None
+        }
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=True)
+        self.session.close()
+
+
+class RoutingPublisher(BasePublisher):
+    """
+    Splits a batch by topic and hands each group to the publisher its
+    topic is routed to; groups are flushed concurrently. Messages sharing
+    a key may be routed to different publishers, so the batch is
+    published in rounds (see ``publish_in_order``) and every publisher
+    gets at most one message per key at a time.
+    """
+
+    def __init__(self, publishers: dict, routes: dict, **options):
+        super().__init__(**options)
+        self.publishers = publishers
+        self.routes = routes
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.max_in_flight,
+            thread_name_prefix="outbox-route",
+        )
+
+    def _publish_group(self, alias: str, messages: list) -> dict:
+        try:
+            return self.publishers[alias].publish(messages)
+        except Exception as exc:
+            logger.exception(
+                "Publisher %r failed on a batch of %d messages",
+                alias,
+                len(messages)
+            )
+            return {msg.id: f"{alias}: {exc}" for msg in messages}
+
+    def publish(self, messages: list) -> dict:
+        return publish_in_order(messages, self._publish_round)
+
+    def _publish_round(self, messages: list) -> dict:
+        groups = {}
+        for msg in messages:
+            alias = self.routes.get(msg.topic, "default")
+            groups.setdefault(alias, []).append(msg)
+        if len(groups) == 1:
+            [(alias, group)] = groups.items()
+            return self._publish_group(alias, group)
+        futures = [
+            self.executor.submit(self._publish_group, alias, group)
+            for alias, group in groups.items()
+        ]
+        errors = {}
+        for future in futures:
+            errors.update(future.result())
+        return errors
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=True)
+        for publisher in self.publishers.values():
+            publisher.close()
+
+
+def get_publisher() -> RoutingPublisher:
+    """
+    Build the relay publisher from ``OUTBOX_PUBLISHERS`` (alias ->
+    ``{"BACKEND": dotted path, "OPTIONS": {...}}``) and ``OUTBOX_ROUTES``
+    (topic -> alias; unrouted topics go to ``default``).
+    """
+    config = getattr(settings, "OUTBOX_PUBLISHERS", DEFAULT_PUBLISHERS)
+    routes = getattr(settings, "OUTBOX_ROUTES", {})
+    if "default" not in config:
+        raise ValueError("OUTBOX_PUBLISHERS must define a 'default' alias.")
+    unknown = set(routes.values()) - set(config)
+    if unknown:
+        raise ValueError(
+            f"OUTBOX_ROUTES refer to unknown publishers: {sorted(unknown)}"
+        )
+    publishers = {
+        alias: import_string(entry["BACKEND"])(**entry.get("OPTIONS", {}))
+        for alias, entry in config.items()
+    }
+    return RoutingPublisher(publishers, routes)
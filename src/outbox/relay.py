@@ -0,0 +1,325 @@
+import logging
+import os
+import select
+import socket
+import threading
+import time
+from datetime import timedelta
+from typing import Optional
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Exists, Min, OuterRef, Q
+from django.utils import timezone
+
+from .models import RETRY_FIELDS, OutboxMessage
+from .publishers import SKIPPED
+
+logger = logging.getLogger(__name__)
+
+
+LEASE_SECONDS = getattr(settings, "OUTBOX_LEASE_SECONDS", 60)
+NOTIFY_CHANNEL = getattr(settings, "OUTBOX_NOTIFY_CHANNEL", "outbox_messages")
+
+
+def default_worker_id(index: int = 0) -> str:
+    return f"{socket.gethostname()[:40]}:{os.getpid()}:{index}"
+
+
+class OutboxRelay:
+    """
+    Claims, publishes and marks one batch of outbox messages at a time.
+
+    On databases with ``SELECT ... FOR UPDATE SKIP LOCKED`` (PostgreSQL)
+    the batch is row-locked for the duration of the publish. Elsewhere
+    (SQLite) rows are claimed by writing a lease to ``claimed_by`` /
+    ``claimed_until`` and the publish happens outside any transaction, so
+    no write lock is held while waiting on the publisher.
+
+    ``partitions`` restricts the relay to a subset of
+    ``OutboxMessage.partition`` values; giving each worker a disjoint
+    subset keeps messages sharing a key on one worker while different
+    keys drain in parallel. On PostgreSQL, where batches are not leased,
+    per-key order also relies on every partition having one worker.
+    """
+
+    def __init__(
+            self,
+            publisher,
+            batch_size: int = 100,
+            partitions: Optional[list[int]] = None,
+            worker_id: Optional[str] = None,
+            lease_seconds: int = LEASE_SECONDS,
+         ):
+        self.publisher = publisher
+        self.batch_size = batch_size
+        self.partitions = partitions
+        self.worker_id = worker_id or default_worker_id()
+        self.lease_seconds = lease_seconds
+
+    @property
+    def use_skip_locked(self) -> bool:
+        return connection.features.has_select_for_update_skip_locked
+
+    def pending(self):
+        """
+        Due messages in creation order, served by the partial
+        ``outbox_pending*`` indexes. A message is held back while an
+        earlier one with its key waits for a retry or is leased, so
+        messages sharing a key are delivered in order; dead-lettering
+        the earlier message releases the key.
+        """
+        now = timezone.now()
+        blocking = OutboxMessage.objects.filter(
+            Q(next_attempt_at__gt=now) | Q(claimed_until__gt=now),
+            key=OuterRef("key"),
+            created_at__lt=OuterRef("created_at"),
+            sent=False,
+            dead_letter=False,
+        )
+        qs = OutboxMessage.objects.filter(
+            ~Exists(blocking),
+            sent=False,
+            dead_letter=False,
+            next_attempt_at__lte=now,
+        )
+        if self.partitions is not None:
+            qs = qs.filter(partition__in=self.partitions)
+        return qs.order_by("created_at", "id")
+
+    def process_batch(self) -> int:
+        """Returns the number of messages sent."""
+        return self._process()[1]
+
+    def _process(self) -> tuple[int, int]:
+        """Returns the number of messages claimed and sent."""
+        if self.use_skip_locked:
+            return self._process_locked()
+        return self._process_leased()
+
+    def _publish(self, messages: list) -> dict:
+        if not messages:
+            return {}
+        try:
+            return self.publisher.publish(messages)
+        except Exception as e:
+            logger.error(f"Failed to publish batch: {e}")
+            return {msg.id: str(e) for msg in messages}
+
+    def _record(self, messages: list, errors: dict) -> int:
+        """
+        Mark delivered messages as sent with one UPDATE and schedule the
+        failed ones for a retry (or dead-letter them) with one bulk UPDATE.
+        Messages skipped behind a failure of their key are only released.
+        Returns the number of messages sent.
+        """
+        now = timezone.now()
+        sent_ids = [msg.id for msg in messages if msg.id not in errors]
+        skipped_ids = [
+            msg.id for msg in messages if errors.get(msg.id) == SKIPPED
+        ]
+        failed = [
+            msg for msg in messages
+            if msg.id in errors and errors[msg.id] != SKIPPED
+        ]
+        if sent_ids:
+            OutboxMessage.objects.filter(id__in=sent_ids).update(
+                sent=True,
+                sent_at=now,
+                claimed_by="",
+                claimed_until=None,
+            )
+        if skipped_ids:
+            OutboxMessage.objects.filter(id__in=skipped_ids).update(
+                claimed_by="",
+                claimed_until=None,
+            )
+        for msg in failed:
+            msg.schedule_retry(errors[msg.id], now)
+            if msg.dead_letter:
+                logger.error(
+                    "Outbox message %s dead-lettered after %d attempts: %s",
+                    msg.id,
+                    msg.attempts,
+                    msg.last_error
+                )
+        if failed:
+            OutboxMessage.objects.bulk_update(failed, RETRY_FIELDS)
+        return len(sent_ids)
+
+    def _process_locked(self) -> tuple[int, int]:
+        with transaction.atomic():
+            messages = list(
+                self.pending()
+                .select_for_update(skip_locked=True)[:self.batch_size]
+            )
+            errors = self._publish(messages)
+            return len(messages), self._record(messages, errors)
+
+    def _claim(self) -> list:
+        now = timezone.now()
+        free = Q(claimed_until__isnull=True) | Q(claimed_until__lt=now)
+        ids = list(
+            self.pending()
+            .filter(free)
+            .values_list("id", flat=True)[:self.batch_size]
+        )
+        if not ids:
+            return []
+        OutboxMessage.objects.filter(free, id__in=ids, sent=False).update(
+            claimed_by=self.worker_id,
+            claimed_until=now + timedelta(seconds=self.lease_seconds),
+        )
+        return list(
+            OutboxMessage.objects
+            .filter(id__in=ids, sent=False, claimed_by=self.worker_id)
+            .order_by("created_at", "id")
+        )
+
+    def _process_leased(self) -> tuple[int, int]:
+        messages = self._claim()
+        if not messages:
+            return 0, 0
+        errors = self._publish(messages)
+        with transaction.atomic():
+            return len(messages), self._record(messages, errors)
+
+    def run(self, waiter, stop: threading.Event) -> None:
+        """
+        Loop until ``stop`` is set. A full batch is followed immediately by
+        the next one, whether or not all of it was delivered; otherwise
+        the relay waits on ``waiter``.
+        """
+        try:
+            while not stop.is_set():
+                claimed, _ = self._process()
+                if claimed >= self.batch_size:
+                    waiter.reset()
+                else:
+                    waiter.wait(stop, idle=claimed == 0)
+        finally:
+            waiter.close()
+
+
+class PollingWaiter:
+    """
+    Adaptive polling: the interval starts at ``min_interval`` and doubles
+    for every consecutive idle batch up to ``max_interval``, so an idle
+    relay costs almost no queries while a busy one reacts quickly.
+    """
+
+    def __init__(self, min_interval: float, max_interval: float):
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        self.interval = min_interval
+
+    def reset(self) -> None:
+        self.interval = self.min_interval
+
+    def wait(self, stop: threading.Event, idle: bool = True) -> None:
+        if not idle:
+            self.reset()
+        stop.wait(self.interval)
+        if idle:
+            self.interval = min(self.interval * 2, self.max_interval)
+
+    def close(self) -> None:
+        pass
+
+
+class PgNotifyWaiter(PollingWaiter):
+    """
+    Sleeps until ``NOTIFY`` arrives on ``channel`` (see
+    ``outbox.signals``), the next retry of a message the relay owns comes
+    due or ``max_interval`` elapses, using a dedicated autocommit
+    connection that ``LISTEN``s for the relay's lifetime. Retries send no
+    ``NOTIFY``, hence the deadline. After a batch that was not empty it
+    only waits ``min_interval``, as polling would. Notifications for
+    partitions the relay does not own are ignored.
+    """
+
+    def __init__(
+            self,
+            min_interval: float,
+            max_interval: float,
+            channel: str = NOTIFY_CHANNEL,
+            partitions: Optional[list[int]] = None,
+         ):
+        super().__init__(min_interval, max_interval)
+        self.partition_ids = partitions
+        self.partitions = (
+            {str(p) for p in partitions} if partitions is not None else None
+        )
+        self.conn = connection.get_new_connection(
+            connection.get_connection_params()
+        )
+        self.conn.autocommit = True
+        with self.conn.cursor() as cursor:
+            cursor.execute(f'LISTEN "{channel}"')
+
+    def _wanted(self, payload: str) -> bool:
+        return self.partitions is None or payload in self.partitions
+
+    def next_due(self):
+        """Earliest scheduled retry among the relay's partitions, if any."""
+        qs = OutboxMessage.objects.filter(
+            sent=False,
+            dead_letter=False,
+            next_attempt_at__gt=timezone.now(),
+        )
+        if self.partition_ids is not None:
+            qs = qs.filter(partition__in=self.partition_ids)
+        return qs.aggregate(due=Min("next_attempt_at"))["due"]
+
+    def timeout(self, idle: bool = True) -> float:
+        if not idle:
+            return self.min_interval
+        due = self.next_due()
+        if due is None:
+            return self.max_interval
+        return min(
+            max((due - timezone.now()).total_seconds(), self.min_interval),
+            self.max_interval,
+        )
+
+    def wait(self, stop: threading.Event, idle: bool = True) -> None:
+        if stop.is_set():
+            return
+        deadline = time.monotonic() + self.timeout(idle)
+        while not stop.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            if callable(getattr(self.conn, "notifies", None)):
+                # psycopg 3
+                for notify in self.conn.notifies(
+                    timeout=remaining,
+                    stop_after=1,
+                ):
+                    if self._wanted(notify.payload):
+                        return
+            else:
+                # psycopg2
+                if select.select([self.conn], [], [], remaining)[0]:
+                    self.conn.poll()
+                    notifies = self.conn.notifies[:]
+                    self.conn.notifies.clear()
+                    if any(self._wanted(n.payload) for n in notifies):
+                        return
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+def get_waiter(
+        min_interval: float,
+        max_interval: float,
+        partitions: Optional[list[int]] = None,
+     ):
+    if connection.vendor == "postgresql":
+        return PgNotifyWaiter(
+            min_interval,
+            max_interval,
+            partitions=partitions,
+        )
+    return PollingWaiter(min_interval, max_interval)
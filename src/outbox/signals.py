@@ -0,0 +1,30 @@
+from django.db import connections
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .models import OutboxMessage
+from .relay import NOTIFY_CHANNEL
+
+
+@receiver(post_save, sender=OutboxMessage)
+def notify_relay(sender, instance, created, using, **kwargs):
+    """
+    Wake relays waiting in ``PgNotifyWaiter``. PostgreSQL delivers the
+    notification when the surrounding transaction commits, so the relay
+    never wakes up before the message is visible.
+    """
+    if not created:
+        return
+    notify_partitions(using, [instance.partition])
+
+
+def notify_partitions(using: str, partitions) -> None:
+    conn = connections[using]
+    if conn.vendor != "postgresql":
+        return
+    with conn.cursor() as cursor:
+        for partition in sorted(set(partitions)):
+            cursor.execute(
+                "SELECT pg_notify(%s, %s)",
+                [NOTIFY_CHANNEL, str(partition)],
+            )
@@ -0,0 +1,33 @@
+import time
+
+from core.testing import StubHandler, StubServer
+
+
+class WebhookStubHandler(StubHandler):
+    def do_POST(self):
+        envelope = self.read_json()
+        if self.stub.delay:
+            time.sleep(self.stub.delay(envelope))
+        self.stub.record(envelope)
+        self.reply(500 if envelope["id"] in self.stub.fail_ids else 200)
+
+
+class WebhookStubServer(StubServer):
+    """
+    Local stand-in for an outbox webhook endpoint, for tests.
+
+    Accepts ``POST`` with one message envelope, records it in ``requests``
+    in arrival order and answers ``200``; envelopes whose ``id`` is in
+    ``fail_ids`` get ``500``. ``delay`` is called with each envelope and
+    returns the seconds to wait before answering. Use as a context
+    manager; ``url`` points at the running server.
+    """
+
+    handler_class = WebhookStubHandler
+    path = "/hooks/outbox"
+    name = "webhook-stub"
+
+    def __init__(self, fail_ids=(), delay=None):
+        self.fail_ids = {str(message_id) for message_id in fail_ids}
+        self.delay = delay
+        super().__init__()
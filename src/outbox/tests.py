@@ -0,0 +1,576 @@
+import gzip
+import json
+import os
+import random
+import tempfile
+import threading
+from contextlib import redirect_stdout
+from datetime import timedelta
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from . import publishers
+from .models import MAX_ATTEMPTS, PARTITIONS, RETRY_BASE_SECONDS, OutboxMessage
+from .relay import OutboxRelay, PgNotifyWaiter, PollingWaiter, get_waiter
+from .signals import notify_partitions
+from .testing import WebhookStubServer
+
+
+def messages(
+        count: int,
+        topic: str = "event_created",
+        key: str = "",
+        **payload
+     ) -> list:
+    """Unsaved messages numbered by ``payload["n"]``, one key each."""
+    return [
+        OutboxMessage(
+            topic=topic,
+            key=key or f"{topic}:{index}",
+            payload={"n": index, **payload},
+        )
+        for index in range(count)
+    ]
+
+
+def enqueue(
+        count: int,
+        topic: str = "event_created",
+        key: str = "",
+        **payload
+     ) -> list:
+    return OutboxMessage.bulk_enqueue(messages(count, topic, key, **payload))
+
+
+class RecordingPublisher(publishers.BasePublisher):
+    def __init__(self, fail=(), batches=None, **options):
+        super().__init__(**options)
+        self.fail = set(fail)
+        self.batches = [] if batches is None else batches
+
+    def publish(self, messages: list) -> dict:
+        return publishers.publish_in_order(messages, self._publish_round)
+
+    def _publish_round(self, messages: list) -> dict:
+        self.batches.append([msg.payload["n"] for msg in messages])
+        return {
+            msg.id: "failed"
+            for msg in messages
+            if msg.payload["n"] in self.fail
+        }
+
+
+class RaisingPublisher(publishers.BasePublisher):
+    def publish(self, messages: list) -> dict:
+        raise RuntimeError("broker down")
+
+
+class RecordingWaiter:
+    """Records the relay's calls; the first wait ends the run."""
+
+    def __init__(self):
+        self.calls = []
+
+    def reset(self):
+        self.calls.append("reset")
+
+    def wait(self, stop: threading.Event, idle: bool = True):
+        self.calls.append("idle" if idle else "wait")
+        stop.set()
+
+    def close(self):
+        self.calls.append("close")
+
+
+class RelayDrainTests(TestCase):
+    def test_batch_is_marked_sent_with_one_update(self):
+        enqueue(30)
+        relay = OutboxRelay(RecordingPublisher(), batch_size=30)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(relay.process_batch(), 30)
+        updates = [
+            query["sql"] for query in queries.captured_queries
+            if query["sql"].startswith("UPDATE")
+        ]
+        # The lease claim and the mark-as-sent.
+        self.assertEqual(len(updates), 2)
+        self.assertFalse(OutboxMessage.objects.filter(sent=False).exists())
+
+    def test_failed_messages_stay_unsent(self):
+        enqueue(5)
+        relay = OutboxRelay(RecordingPublisher(fail={1, 3}), batch_size=10)
+        self.assertEqual(relay.process_batch(), 3)
+        self.assertEqual(
+            sorted(
+                OutboxMessage.objects.filter(sent=False)
+                .values_list("payload__n", flat=True)
+            ),
+            [1, 3],
+        )
+
+    def test_run_drains_backlog_before_waiting(self):
+        enqueue(250)
+        publisher = RecordingPublisher()
+        waiter = RecordingWaiter()
+        OutboxRelay(publisher, batch_size=100).run(waiter, threading.Event())
+        self.assertEqual(
+            [len(batch) for batch in publisher.batches],
+            [100, 100, 50],
+        )
+        # Full batches loop straight on; only the partial one waits.
+        self.assertEqual(waiter.calls, ["reset", "reset", "wait", "close"])
+        self.assertEqual(OutboxMessage.objects.filter(sent=True).count(), 250)
+
+    def test_run_keeps_draining_after_a_full_batch_with_failures(self):
+        enqueue(150)
+        publisher = RecordingPublisher(fail=set(range(0, 100, 10)))
+        waiter = RecordingWaiter()
+        OutboxRelay(publisher, batch_size=100).run(waiter, threading.Event())
+        self.assertEqual(
+            [len(batch) for batch in publisher.batches],
+            [100, 50],
+        )
+        self.assertEqual(waiter.calls, ["reset", "wait", "close"])
+        self.assertEqual(OutboxMessage.objects.filter(sent=True).count(), 140)
+
+    def test_run_waits_idle_on_empty_outbox(self):
+        publisher = RecordingPublisher()
+        waiter = RecordingWaiter()
+        OutboxRelay(publisher, batch_size=100).run(waiter, threading.Event())
+        self.assertEqual(publisher.batches, [])
+        self.assertEqual(waiter.calls, ["idle", "close"])
+
+
+class PublisherTests(SimpleTestCase):
+    def test_console_publisher_prints_each_message(self):
+        output = StringIO()
+        with redirect_stdout(output):
+            errors = publishers.ConsolePublisher().publish(
+                messages(2, name="Ёлка")
+            )
+        self.assertEqual(errors, {})
+        self.assertEqual(
+            output.getvalue().splitlines(),
+            [
+                'Sending topic=event_created payload={"n": 0, '
+                '"name": "Ёлка"}',
+                'Sending topic=event_created payload={"n": 1, '
+                '"name": "Ёлка"}',
+            ],
+        )
+
+    def test_in_memory_outbox_is_per_instance(self):
+        first = publishers.InMemoryPublisher()
+        second = publishers.InMemoryPublisher()
+        batch = messages(3)
+        self.assertEqual(first.publish(batch), {})
+        self.assertEqual(
+            [item["id"] for item in first.outbox],
+            [str(msg.id) for msg in batch],
+        )
+        self.assertEqual(first.outbox[0]["payload"], {"n": 0})
+        self.assertEqual(second.outbox, [])
+
+    def test_webhook_reports_only_failed_messages(self):
+        batch = messages(6)
+        failed = {batch[1].id, batch[4].id}
+        with WebhookStubServer(fail_ids=failed) as stub:
+            publisher = publishers.WebhookPublisher(stub.url, max_in_flight=4)
+            try:
+                with self.assertLogs("outbox.publishers", "ERROR"):
+                    errors = publisher.publish(batch)
+            finally:
+                publisher.close()
+        self.assertEqual(set(errors), failed)
+        self.assertIn("500", errors[batch[1].id])
+        self.assertCountEqual(
+            [item["id"] for item in stub.requests],
+            [str(msg.id) for msg in batch],
+        )
+
+    def test_webhook_connection_error_fails_every_message(self):
+        with WebhookStubServer() as stub:
+            url = stub.url
+        publisher = publishers.WebhookPublisher(url, timeout=1)
+        batch = messages(2)
+        try:
+            with self.assertLogs("outbox.publishers", "ERROR"):
+                errors = publisher.publish(batch)
+        finally:
+            publisher.close()
+        self.assertEqual(set(errors), {msg.id for msg in batch})
+
+    def test_routing_merges_partial_failures(self):
+        default = publishers.InMemoryPublisher()
+        hooks = RecordingPublisher(fail={1})
+        publisher = publishers.RoutingPublisher(
+            {"default": default, "hooks": hooks, "broken": RaisingPublisher()},
+            {"registration": "hooks", "audit": "broken"},
+        )
+        routed = messages(2, "registration")
+        broken = messages(2, "audit")
+        created = messages(2)
+        try:
+            with self.assertLogs("outbox.publishers", "ERROR"):
+                errors = publisher.publish(routed + broken + created)
+        finally:
+            publisher.close()
+        self.assertEqual(
+            errors,
+            {
+                routed[1].id: "failed",
+                broken[0].id: "broken: broker down",
+                broken[1].id: "broken: broker down",
+            },
+        )
+        self.assertEqual(hooks.batches, [[0, 1]])
+        self.assertEqual(
+            [item["id"] for item in default.outbox],
+            [str(msg.id) for msg in created],
+        )
+
+    @override_settings(
+        OUTBOX_PUBLISHERS={
+            "default": {"BACKEND": "outbox.publishers.InMemoryPublisher"},
+        },
+        OUTBOX_ROUTES={"registration": "hooks"},
+    )
+    def test_routes_must_name_configured_publishers(self):
+        with self.assertRaisesMessage(ValueError, "['hooks']"):
+            publishers.get_publisher()
+
+
+class KeyOrderTests(SimpleTestCase):
+    def test_key_defaults_to_event_then_topic(self):
+        event = OutboxMessage(topic="event_created", payload={"event_id": 7})
+        event.assign_key()
+        other = OutboxMessage(topic="digest", payload={})
+        other.assign_key()
+        explicit = OutboxMessage(topic="digest", key="user:1", payload={})
+        explicit.assign_key()
+        self.assertEqual(
+            [event.key, other.key, explicit.key],
+            ["7", "digest", "user:1"],
+        )
+        self.assertEqual(
+            event.partition,
+            OutboxMessage.partition_for("7"),
+        )
+
+    def test_webhook_keeps_per_key_order(self):
+        batch = [
+            msg
+            for pair in zip(messages(20, key="event:1"), messages(20))
+            for msg in pair
+        ]
+        with WebhookStubServer(
+            delay=lambda envelope: random.uniform(0, 0.01)
+        ) as stub:
+            publisher = publishers.WebhookPublisher(stub.url, max_in_flight=8)
+            try:
+                self.assertEqual(publisher.publish(batch), {})
+            finally:
+                publisher.close()
+        ordered = [
+            item["payload"]["n"]
+            for item in stub.requests
+            if item["id"] in {str(msg.id) for msg in batch[::2]}
+        ]
+        self.assertEqual(ordered, list(range(20)))
+        self.assertEqual(len(stub.requests), 40)
+
+    def test_failure_skips_the_rest_of_its_key(self):
+        keyed = messages(4, key="event:1")
+        others = messages(3)
+        with WebhookStubServer(fail_ids=[keyed[1].id]) as stub:
+            publisher = publishers.WebhookPublisher(stub.url)
+            try:
+                with self.assertLogs("outbox.publishers", "ERROR"):
+                    errors = publisher.publish(keyed + others)
+            finally:
+                publisher.close()
+        self.assertEqual(set(errors), {msg.id for msg in keyed[1:]})
+        self.assertEqual(errors[keyed[2].id], publishers.SKIPPED)
+        self.assertEqual(errors[keyed[3].id], publishers.SKIPPED)
+        self.assertCountEqual(
+            [item["id"] for item in stub.requests],
+            [str(msg.id) for msg in keyed[:2] + others],
+        )
+
+    def test_routing_keeps_order_across_publishers(self):
+        sent = []
+        publisher = publishers.RoutingPublisher(
+            {
+                "default": RecordingPublisher(batches=sent),
+                "updates": RecordingPublisher(batches=sent),
+            },
+            {"event_updated": "updates"},
+        )
+        batch = [
+            OutboxMessage(
+                topic=("event_created", "event_updated")[index % 2],
+                key="event:1",
+                payload={"n": index},
+            )
+            for index in range(6)
+        ]
+        try:
+            self.assertEqual(publisher.publish(batch), {})
+        finally:
+            publisher.close()
+        self.assertEqual(sent, [[index] for index in range(6)])
+
+
+class WaiterTests(TestCase):
+    def test_polling_backs_off_while_idle(self):
+        waiter = PollingWaiter(0.05, 0.3)
+        stop = threading.Event()
+        stop.set()
+        intervals = []
+        for _ in range(4):
+            waiter.wait(stop, idle=True)
+            intervals.append(waiter.interval)
+        self.assertEqual(intervals, [0.1, 0.2, 0.3, 0.3])
+        waiter.wait(stop, idle=False)
+        self.assertEqual(waiter.interval, 0.05)
+        waiter.wait(stop)
+        waiter.reset()
+        self.assertEqual(waiter.interval, 0.05)
+
+    def test_max_interval_is_at_least_min_interval(self):
+        self.assertEqual(PollingWaiter(2, 1).max_interval, 2)
+
+    def test_sqlite_polls_without_notify(self):
+        self.assertIsInstance(get_waiter(0.05, 5), PollingWaiter)
+        with self.assertNumQueries(1):
+            enqueue(1)
+        with self.assertNumQueries(0):
+            notify_partitions("default", [1, 2])
+
+    def pg_waiter(self, partitions=None):
+        # No LISTEN connection; only the timeout is computed here.
+        with mock.patch.object(connection, "get_new_connection"):
+            return PgNotifyWaiter(0.05, 30, partitions=partitions)
+
+    def test_notify_waiter_wakes_for_the_next_retry(self):
+        waiter = self.pg_waiter()
+        self.assertEqual(waiter.timeout(idle=True), 30)
+        self.assertEqual(waiter.timeout(idle=False), 0.05)
+
+        msg = enqueue(1)[0]
+        OutboxMessage.objects.filter(id=msg.id).update(
+            next_attempt_at=timezone.now() + timedelta(seconds=3)
+        )
+        self.assertAlmostEqual(waiter.timeout(idle=True), 3, delta=0.5)
+        # Only the partitions the relay owns.
+        other = self.pg_waiter(partitions=[(msg.partition + 1) % PARTITIONS])
+        self.assertEqual(other.timeout(idle=True), 30)
+
+        OutboxMessage.objects.filter(id=msg.id).update(
+            next_attempt_at=timezone.now() + timedelta(milliseconds=1)
+        )
+        self.assertEqual(waiter.timeout(idle=True), 0.05)
+
+    def test_command_rejects_bad_options(self):
+        for args, error in (
+            (["--batch-size", "0"], "--batch-size"),
+            (["--poll-interval", "-1"], "must not be negative"),
+            (["--workers", "0"], "--workers"),
+        ):
+            with self.subTest(args=args):
+                with self.assertRaisesMessage(CommandError, error):
+                    call_command("process_outbox", *args)
+
+
+class PruneOutboxTests(TestCase):
+    def setUp(self):
+        now = timezone.now()
+        self.old_sent = enqueue(3, "event_created")
+        self.new_sent = enqueue(1, "event_updated")
+        self.old_dead = enqueue(2, "digest")
+        self.new_dead = enqueue(1, "reminder")
+        self.pending = enqueue(1, "audit")
+        self.update(self.old_sent, sent=True, sent_at=now - timedelta(40))
+        self.update(self.new_sent, sent=True, sent_at=now - timedelta(10))
+        self.update(
+            self.old_dead,
+            dead_letter=True,
+            attempts=10,
+            last_error="500",
+            created_at=now - timedelta(100),
+        )
+        self.update(
+            self.new_dead,
+            dead_letter=True,
+            created_at=now - timedelta(40),
+        )
+        self.update(self.pending, created_at=now - timedelta(400))
+        self.archive_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.archive_dir.cleanup)
+
+    def update(self, messages, **fields):
+        OutboxMessage.objects.filter(
+            id__in=[msg.id for msg in messages]
+        ).update(**fields)
+
+    def prune(self, *args):
+        output = StringIO()
+        call_command(
+            "prune_outbox",
+            "--archive-dir",
+            self.archive_dir.name,
+            *args,
+            stdout=output,
+        )
+        return output.getvalue()
+
+    def remaining(self) -> set:
+        return set(OutboxMessage.objects.values_list("id", flat=True))
+
+    def test_archives_then_deletes_sent_and_dead_letters(self):
+        with mock.patch(
+            "outbox.management.commands.prune_outbox.os.fsync",
+            wraps=os.fsync,
+        ) as fsync:
+            output = self.prune("--batch-size", "2")
+        self.assertIn("Pruned 5 outbox messages (2 dead-lettered).", output)
+        # Two batches of sent messages and one of dead letters, each on
+        # disk before it is deleted.
+        self.assertEqual(fsync.call_count, 3)
+        self.assertEqual(
+            self.remaining(),
+            {msg.id for msg in self.new_sent + self.new_dead + self.pending},
+        )
+        [archive] = Path(self.archive_dir.name).iterdir()
+        with gzip.open(archive, "rt", encoding="utf-8") as fh:
+            rows = [json.loads(line) for line in fh]
+        self.assertCountEqual(
+            [row["id"] for row in rows[:3]],
+            [str(msg.id) for msg in self.old_sent],
+        )
+        self.assertCountEqual(
+            [row["id"] for row in rows[3:]],
+            [str(msg.id) for msg in self.old_dead],
+        )
+        self.assertEqual(
+            rows[-1],
+            {
+                **rows[-1],
+                "topic": "digest",
+                "sent_at": None,
+                "attempts": 10,
+                "last_error": "500",
+                "dead_letter": True,
+            },
+        )
+
+    def test_dead_letter_retention_is_separate(self):
+        self.prune("--days", "0", "--dead-letter-days", "30")
+        self.assertEqual(self.remaining(), {msg.id for msg in self.pending})
+
+    def test_no_archive_only_deletes(self):
+        output = self.prune("--no-archive")
+        self.assertNotIn("Archived", output)
+        self.assertEqual(list(Path(self.archive_dir.name).iterdir()), [])
+        self.assertEqual(len(self.remaining()), 3)
+
+    def test_nothing_to_prune_writes_no_archive(self):
+        output = self.prune("--days", "60", "--dead-letter-days", "365")
+        self.assertIn("Pruned 0 outbox messages", output)
+        self.assertEqual(list(Path(self.archive_dir.name).iterdir()), [])
+
+
+class RetryTests(TestCase):
+    def setUp(self):
+        self.publisher = RecordingPublisher(fail={0})
+        self.relay = OutboxRelay(self.publisher, batch_size=10)
+
+    def refresh(self, *messages):
+        for msg in messages:
+            msg.refresh_from_db()
+
+    def update(self, msg, **fields):
+        OutboxMessage.objects.filter(id=msg.id).update(**fields)
+
+    def test_backoff_doubles_with_jitter(self):
+        now = timezone.now()
+        msg = OutboxMessage(topic="event_created", payload={})
+        for attempt in range(1, MAX_ATTEMPTS):
+            msg.schedule_retry("boom", now)
+            full = RETRY_BASE_SECONDS * 2 ** (attempt - 1)
+            delay = (msg.next_attempt_at - now).total_seconds()
+            self.assertGreaterEqual(delay, full / 2)
+            self.assertLessEqual(delay, full)
+        self.assertFalse(msg.dead_letter)
+        msg.schedule_retry("x" * 3000, now)
+        self.assertTrue(msg.dead_letter)
+        self.assertEqual(msg.attempts, MAX_ATTEMPTS)
+        self.assertEqual(len(msg.last_error), 2000)
+
+    def test_backoff_is_capped(self):
+        now = timezone.now()
+        msg = OutboxMessage(topic="event_created", payload={}, attempts=7)
+        with mock.patch("outbox.models.RETRY_MAX_SECONDS", 60):
+            msg.schedule_retry("boom", now)
+        self.assertLessEqual((msg.next_attempt_at - now).total_seconds(), 60)
+
+    def test_failure_holds_back_later_messages_of_its_key(self):
+        first, second = enqueue(2, key="event:1")
+        enqueue(1, "event_updated", n=5)
+        self.assertEqual(self.relay.process_batch(), 1)
+        self.refresh(first, second)
+        self.assertEqual(first.attempts, 1)
+        self.assertEqual(first.last_error, "failed")
+        self.assertGreater(first.next_attempt_at, timezone.now())
+        # Skipped behind the failure: released, without an attempt.
+        self.assertEqual(
+            (second.sent, second.attempts, second.claimed_by),
+            (False, 0, ""),
+        )
+        self.assertEqual(self.publisher.batches, [[0, 5]])
+
+        self.assertEqual(self.relay.process_batch(), 0)
+        self.assertEqual(self.publisher.batches, [[0, 5]])
+
+        self.update(first, next_attempt_at=timezone.now())
+        self.publisher.fail.clear()
+        self.assertEqual(self.relay.process_batch(), 2)
+        self.assertEqual(self.publisher.batches[1:], [[0], [1]])
+
+    def test_dead_letter_releases_the_key(self):
+        first, second = enqueue(2, key="event:1")
+        self.update(first, attempts=MAX_ATTEMPTS - 1)
+        with self.assertLogs("outbox.relay", "ERROR"):
+            self.assertEqual(self.relay.process_batch(), 0)
+        self.refresh(first)
+        self.assertTrue(first.dead_letter)
+        self.assertEqual(first.attempts, MAX_ATTEMPTS)
+        self.assertEqual(self.relay.process_batch(), 1)
+        self.refresh(second)
+        self.assertTrue(second.sent)
+
+    def test_expired_lease_is_claimed_again(self):
+        self.publisher.fail.clear()
+        first, second = enqueue(2, key="event:1")
+        self.update(
+            first,
+            claimed_by="crashed",
+            claimed_until=timezone.now() + timedelta(seconds=60),
+        )
+        self.assertEqual(self.relay.process_batch(), 0)
+        self.update(
+            first,
+            claimed_until=timezone.now() - timedelta(seconds=1),
+        )
+        self.assertEqual(self.relay.process_batch(), 2)
+        self.assertEqual(self.publisher.batches, [[0], [1]])
+        self.refresh(first)
+        self.assertEqual((first.claimed_by, first.claimed_until), ("", None))
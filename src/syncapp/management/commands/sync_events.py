@@ -1,6 +1,5 @@
 import logging
 from datetime import datetime
-from uuid import UUID
 
 from django.conf import settings
 from django.core.management.base import BaseCommand, CommandError
@@ -8,18 +7,21 @@ from django.db import transaction
 from django.utils import timezone
 from django.utils.dateparse import parse_date, parse_datetime
 
-from events.models import Event, Venue
+from events.cache import bump_events_version
 
+from ... import services
 from ...models import SyncResult
-from ...services import _iter_events_from_provider, _parse_event_payload
 
 logger = logging.getLogger(__name__)
 
+FAILED = "failed: "
+
 
 class Command(BaseCommand):
     help = (
-        "Synchronize events from events-provider. Use --all for full sync or "
-        "--date=YYYY-MM-DD to sync from date."
+        "Synchronize events from events-provider. Use --all for full sync, "
+        "--date=YYYY-MM-DD to sync from date or --resume to continue the "
+        "last sync if it failed."
     )
 
     def add_arguments(self, parser):
@@ -39,10 +41,38 @@ class Command(BaseCommand):
             type=str,
             help="Override provider URL for this run",
         )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=services.SYNC_BATCH_SIZE,
+            help="Number of events written per bulk upsert "
+            f"(default {services.SYNC_BATCH_SIZE})",
+        )
+        parser.add_argument(
+            "--prefetch-pages",
+            type=int,
+            default=services.PREFETCH_PAGES,
+            help="Provider pages fetched ahead of the database writes; 0 "
+            f"fetches one page at a time (default {services.PREFETCH_PAGES})",
+        )
+        parser.add_argument(
+            "--stream",
+            action="store_true",
+            default=services.STREAM_PAGES,
+            help="Parse provider pages incrementally to bound memory on "
+            "huge pages; pages are then fetched one at a time",
+        )
+        parser.add_argument(
+            "--resume",
+            action="store_true",
+            help="Continue the last sync from its checkpoint if it failed",
+        )
 
     def handle(self, *args, **options):
         full = options["all"]
         date_arg = options.get("date")
+        batch_size = options["batch_size"]
+        prefetch = options["prefetch_pages"]
         provider_url = options.get(
             "provider_url"
         ) or getattr(settings, "EVENTS_PROVIDER_API", None)
@@ -53,151 +83,187 @@ class Command(BaseCommand):
                 "--provider-url not provided."
             )
 
-        if full:
-            changed_from = None
-        elif date_arg:
-            changed_from = parse_datetime(date_arg)
-            if not changed_from:
-                parsed_date = parse_date(date_arg)
-                if parsed_date:
-                    changed_from = datetime.combine(
-                        parsed_date,
-                        datetime.min.time()
-                    )
-                else:
-                    raise CommandError(
-                        "Cannot parse date. Use YYYY-MM-DD or ISO datetime."
-                    )
-        else:
-            last_sync = SyncResult.objects.order_by("-finished_at").first()
-            changed_from = (
-                last_sync.changed_to if last_sync
-                and last_sync.changed_to else None
+        if batch_size < 1:
+            raise CommandError("--batch-size must be a positive integer.")
+        if prefetch < 0:
+            raise CommandError("--prefetch-pages must not be negative.")
+
+        if options["resume"]:
+            if full or date_arg:
+                raise CommandError(
+                    "--resume cannot be combined with --all or --date."
+                )
+            running = (
+                SyncResult.objects
+                .filter(completed=False, finished_at__isnull=True)
+                .order_by("-started_at")
+                .first()
             )
+            if running is not None:
+                raise CommandError(
+                    f"Sync {running.pk} is still running; resume it once "
+                    "it has failed."
+                )
+            # Only the latest sync: an older failure has been superseded.
+            sync = SyncResult.objects.order_by("-started_at").first()
+            if sync is None or sync.completed or not (
+                sync.raw_response_summary.startswith(FAILED)
+            ):
+                raise CommandError("There is no failed sync to resume.")
+            self.stdout.write(
+                f"Resuming sync {sync.pk}. full={sync.full_sync} "
+                f"checkpoint={sync.checkpoint_url or provider_url} "
+                f"offset={sync.checkpoint_offset}"
+            )
+            sync.finished_at = None
+            sync.raw_response_summary = ""
+            sync.save(update_fields=["finished_at", "raw_response_summary"])
+        else:
+            if full:
+                changed_from = None
+            elif date_arg:
+                changed_from = parse_datetime(date_arg)
+                if not changed_from:
+                    parsed_date = parse_date(date_arg)
+                    if parsed_date:
+                        changed_from = datetime.combine(
+                            parsed_date,
+                            datetime.min.time()
+                        )
+                    else:
+                        raise CommandError(
+                            "Cannot parse date. Use YYYY-MM-DD or ISO "
+                            "datetime."
+                        )
+            else:
+                last_sync = (
+                    SyncResult.objects
+                    .filter(completed=True)
+                    .order_by("-finished_at")
+                    .first()
+                )
+                changed_from = (
+                    last_sync.changed_to if last_sync
+                    and last_sync.changed_to else None
+                )
 
-        self.stdout.write(
-            f"Starting sync. full={full} changed_from={changed_from} "
-            f"provider_url={provider_url}"
-        )
+            self.stdout.write(
+                f"Starting sync. full={full} changed_from={changed_from} "
+                f"provider_url={provider_url}"
+            )
 
-        sync = SyncResult(full_sync=full, changed_from=changed_from)
-        sync.save()
-        added = 0
-        updated = 0
-        latest_changed_to = None
+            sync = SyncResult(full_sync=full, changed_from=changed_from)
+            sync.save()
 
-        params = {}
-        if changed_from:
-            params["changed_at"] = changed_from.date().isoformat()
+        if sync.checkpoint_url:
+            start_url = sync.checkpoint_url
+            params = None
+        else:
+            start_url = provider_url
+            params = {}
+            if sync.changed_from:
+                params["changed_at"] = sync.changed_from.date().isoformat()
 
+        client = services.EventsProviderClient(
+            pool_size=max(services.POOL_SIZE, prefetch)
+        )
         try:
-            batch_count = 0
-            with transaction.atomic():
-                for payload in _iter_events_from_provider(
-                    provider_url,
-                    params=params
-                ):
-                    parsed = _parse_event_payload(payload)
-                    possible_ts = (
-                        payload.get("changed_at")
-                        or payload.get("updated_at")
-                        or payload.get("event_time")
-                    )
-                    if possible_ts:
-                        parsed_ts = parse_datetime(possible_ts)
-                        if parsed_ts and (
-                            latest_changed_to is None
-                            or parsed_ts > latest_changed_to
-                        ):
-                            latest_changed_to = parsed_ts
-
-                    v = None
-                    v_data = parsed.get("venue")
-                    if v_data:
-                        try:
-                            v_uuid = v_data.get("id")
-                            if v_uuid:
-                                UUID(str(v_uuid))
-                                v, _ = Venue.objects.get_or_create(
-                                    id=v_uuid,
-                                    defaults={
-                                        "name": v_data.get("name")
-                                        or ""
-                                    },
-                                )
-                                if v.name != (v_data.get("name") or ""):
-                                    v.name = v_data.get("name") or ""
-                                    v.save()
-                            else:
-                                v, _ = Venue.objects.get_or_create(
-                                    name=v_data.get("name") or ""
-                                )
-                        except Exception:
-                            v, _ = Venue.objects.get_or_create(
-                                name=v_data.get("name") or ""
-                            )
-
-                    e_kwargs = {}
-                    if parsed.get("id"):
-                        e_kwargs["id"] = parsed["id"]
-                    elif parsed.get("name") and parsed.get("event_time"):
-                        e_kwargs["name"] = parsed["name"]
-                        e_kwargs["event_time"] = parsed["event_time"]
-
-                    if not e_kwargs:
-                        logger.warning(
-                            "Skipping malformed event payload: %s",
-                            payload
-                        )
-                        continue
-
-                    defaults = {
-                        "name": parsed["name"],
-                        "event_time": parsed["event_time"],
-                        "status": parsed["status"],
-                        "venue": v,
-                    }
-
-                    obj, created = Event.objects.update_or_create(
-                        defaults=defaults, **e_kwargs
-                    )
-                    if created:
-                        added += 1
-                    else:
-                        changed = False
-                        if obj.name != defaults["name"]:
-                            obj.name = defaults["name"]
-                            changed = True
-                        if obj.event_time != defaults["event_time"]:
-                            obj.event_time = defaults["event_time"]
-                            changed = True
-                        if obj.status != defaults["status"]:
-                            obj.status = defaults["status"]
-                            changed = True
-                        if obj.venue_id != (v.id if v else None):
-                            obj.venue = v
-                            changed = True
-                        if changed:
-                            obj.save()
-                            updated += 1
-
-                    batch_count += 1
-
-            sync.added = added
-            sync.updated = updated
-            sync.changed_to = latest_changed_to
-            sync.finished_at = timezone.now()
-            sync.raw_response_summary = f"processed_items={batch_count}"
-            sync.save()
+            self._sync(
+                sync,
+                services._iter_pages(
+                    client,
+                    start_url,
+                    params,
+                    prefetch=prefetch,
+                    stream=options["stream"],
+                ),
+                batch_size,
+            )
             self.stdout.write(
                 self.style.SUCCESS(
-                    f"Sync finished: added={added} updated={updated}"
+                    f"Sync finished: added={sync.added} "
+                    f"updated={sync.updated} "
+                    f"skipped_unchanged={sync.skipped_unchanged}"
                 )
             )
 
         except Exception as exc:
             logger.exception("Sync failed")
-            sync.raw_response_summary = f"failed: {str(exc)}"
+            sync.raw_response_summary = f"{FAILED}{exc}"
             sync.finished_at = timezone.now()
-            sync.save()
+            sync.save(update_fields=["raw_response_summary", "finished_at"])
             raise CommandError(f"Sync failed: {exc}")
+        finally:
+            client.close()
+
+    def _sync(self, sync, pages, batch_size):
+        """
+        Stream provider pages into chunks and commit each chunk together
+        with a checkpoint, so a failure only loses the chunk in progress.
+        """
+        venues = services.VenueResolver()
+        processed = sync.processed
+        latest_changed_to = sync.changed_to
+        offset = sync.checkpoint_offset
+        chunk = []
+
+        for page in pages:
+            for index, payload in enumerate(page["items"]):
+                if index < offset:
+                    continue
+                parsed = services._parse_event_payload(payload)
+                possible_ts = (
+                    payload.get("changed_at")
+                    or payload.get("updated_at")
+                    or payload.get("event_time")
+                )
+                if possible_ts:
+                    parsed_ts = parse_datetime(possible_ts)
+                    if parsed_ts and (
+                        latest_changed_to is None
+                        or parsed_ts > latest_changed_to
+                    ):
+                        latest_changed_to = parsed_ts
+
+                if not parsed.get("id") and not (
+                    parsed.get("name") and parsed.get("event_time")
+                ):
+                    logger.warning(
+                        "Skipping malformed event payload: %s",
+                        payload
+                    )
+                    continue
+
+                chunk.append(parsed)
+                processed += 1
+                if len(chunk) >= batch_size:
+                    sync.processed = processed
+                    sync.changed_to = latest_changed_to
+                    sync.checkpoint_url = page["url"]
+                    sync.checkpoint_offset = index + 1
+                    self._commit_chunk(sync, chunk, venues)
+                    chunk = []
+            offset = 0
+
+        sync.processed = processed
+        sync.changed_to = latest_changed_to
+        sync.checkpoint_url = ""
+        sync.checkpoint_offset = 0
+        sync.completed = True
+        sync.finished_at = timezone.now()
+        sync.raw_response_summary = f"processed_items={processed}"
+        self._commit_chunk(sync, chunk, venues)
+
+    def _commit_chunk(self, sync, chunk, venues):
+        with transaction.atomic():
+            if chunk:
+                venues_written = venues.written
+                added, updated, skipped = services._upsert_events(
+                    chunk, venues
+                )
+                sync.added += added
+                sync.updated += updated
+                sync.skipped_unchanged += skipped
+                if added or updated or venues.written != venues_written:
+                    bump_events_version()
+            sync.save()
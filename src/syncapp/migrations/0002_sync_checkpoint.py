@@ -0,0 +1,44 @@
+# Generated by Django 5.2.7 on 2026-10-18 06:56
+
+from django.db import migrations, models
+
+
+def mark_finished_syncs_completed(apps, schema_editor):
+    SyncResult = apps.get_model("syncapp", "SyncResult")
+    SyncResult.objects.filter(
+        raw_response_summary__startswith="processed_items="
+    ).update(completed=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('syncapp', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='syncresult',
+            name='checkpoint_offset',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='syncresult',
+            name='checkpoint_url',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='syncresult',
+            name='completed',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='syncresult',
+            name='processed',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(
+            mark_finished_syncs_completed,
+            migrations.RunPython.noop,
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 06:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('syncapp', '0002_sync_checkpoint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='syncresult',
+            name='skipped_unchanged',
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -9,7 +9,12 @@ class SyncResult(models.Model):
     changed_to = models.DateTimeField(null=True, blank=True)
     added = models.IntegerField(default=0)
     updated = models.IntegerField(default=0)
+    skipped_unchanged = models.IntegerField(default=0)
     raw_response_summary = models.TextField(blank=True)
+    processed = models.IntegerField(default=0)
+    completed = models.BooleanField(default=False)
+    checkpoint_url = models.TextField(blank=True)
+    checkpoint_offset = models.IntegerField(default=0)
 
     class Meta:
         ordering = ("-started_at",)
@@ -17,5 +22,6 @@ class SyncResult(models.Model):
     def __str__(self):
         return (
             f"Sync {self.started_at.isoformat()} "
-            f"added={self.added} updated={self.updated} full={self.full_sync}"
+            f"added={self.added} updated={self.updated} "
+            f"skipped_unchanged={self.skipped_unchanged} full={self.full_sync}"
         )
@@ -0,0 +1,84 @@
+import json
+import time
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+from core.testing import StubHandler, StubServer
+
+
+class ProviderStubHandler(StubHandler):
+    def do_GET(self):
+        stub = self.stub
+        with stub._lock:
+            stub.requests.append(self.path)
+            canned = stub.responses.pop(0) if stub.responses else 0
+        if canned is None:
+            self.close_connection = True
+            return
+        if canned:
+            return self.reply(canned)
+        number, page = stub.page(parse_qs(urlsplit(self.path).query))
+        time.sleep(stub.slow_pages.get(number, 0))
+        if number in stub.fail_pages:
+            return self.reply(stub.fail_pages[number])
+        self.reply(200, json.dumps(page).encode())
+
+
+class ProviderStubServer(StubServer):
+    """
+    Local stand-in for the events provider, for tests.
+
+    Serves ``events`` DRF-style, ``page_size`` at a time: ``GET`` answers
+    ``{"count", "next", "previous", "results"}``, paginated by a ``page``
+    query parameter or, with ``paginate_by="offset"``, by ``offset``.
+    ``count`` and ``next`` reflect ``events`` at the time of the request,
+    so tests can add events while a sync is running.
+
+    ``responses`` is consumed one entry per request before anything else:
+    an HTTP status to answer with, or ``None`` to drop the connection.
+    ``fail_pages`` maps a page number to the status it always answers and
+    ``slow_pages`` to a delay in seconds. Request paths are recorded in
+    ``requests``. Use as a context manager; ``url`` points at the list.
+    """
+
+    handler_class = ProviderStubHandler
+    path = "/api/events/"
+    name = "provider-stub"
+
+    def __init__(
+            self,
+            events=(),
+            page_size: int = 5,
+            paginate_by: str = "page",
+         ):
+        self.events = list(events)
+        self.page_size = page_size
+        self.paginate_by = paginate_by
+        self.responses = []
+        self.fail_pages = {}
+        self.slow_pages = {}
+        super().__init__()
+
+    def page(self, query: dict) -> tuple[int, dict]:
+        """Page number and body for the query of one request."""
+        with self._lock:
+            events = list(self.events)
+        if self.paginate_by == "offset":
+            start = int(query.get("offset", ["0"])[0])
+            number = start // self.page_size + 1
+        else:
+            number = int(query.get("page", ["1"])[0])
+            start = (number - 1) * self.page_size
+        end = start + self.page_size
+        next_url = None
+        if end < len(events):
+            if self.paginate_by == "offset":
+                query = {**query, "offset": [str(end)]}
+            else:
+                query = {**query, "page": [str(number + 1)]}
+            next_url = f"{self.url}?{urlencode(query, doseq=True)}"
+        return number, {
+            "count": len(events),
+            "next": next_url,
+            "previous": None,
+            "results": events[start:end],
+        }
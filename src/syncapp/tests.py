@@ -0,0 +1,418 @@
+import json
+import uuid
+from datetime import datetime, timezone
+from io import StringIO
+from unittest import mock
+
+import requests
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase, TestCase
+
+from events.models import Event, Venue
+
+from . import services
+from .models import SyncResult
+from .testing import ProviderStubServer
+
+
+def payload(index, **fields):
+    return {
+        "id": str(uuid.UUID(int=index)),
+        "name": f"Event {index}",
+        "event_time": f"2030-01-{index:02d}T10:00:00Z",
+        "status": "open",
+        **fields,
+    }
+
+
+def upsert(payloads):
+    return services._upsert_events(
+        [services._parse_event_payload(p) for p in payloads],
+        services.VenueResolver(),
+    )
+
+
+class UpsertEventsTests(TestCase):
+    def test_creates_then_updates_only_changed_rows(self):
+        self.assertEqual(upsert([payload(1), payload(2)]), (2, 0, 0))
+
+        result = upsert([payload(1), payload(2, name="Renamed"), payload(3)])
+
+        self.assertEqual(result, (1, 1, 1))
+        self.assertEqual(
+            list(Event.objects.order_by("event_time").values_list(
+                "name",
+                flat=True,
+            )),
+            ["Event 1", "Renamed", "Event 3"],
+        )
+
+    def test_chunk_is_written_with_a_fixed_number_of_queries(self):
+        upsert([payload(index) for index in range(1, 11)])
+        changed = [
+            payload(index, status="closed") for index in range(1, 21)
+        ]
+        resolver = services.VenueResolver()
+        # Stored hashes, rows to diff, one bulk insert, one bulk update.
+        with self.assertNumQueries(4):
+            result = services._upsert_events(
+                [services._parse_event_payload(p) for p in changed],
+                resolver,
+            )
+        self.assertEqual(result, (10, 10, 0))
+        self.assertEqual(Event.objects.filter(status="closed").count(), 20)
+
+    def test_payload_without_id_matches_on_name_and_time(self):
+        anonymous = {
+            "name": "Walk-in",
+            "event_time": "2030-02-01T10:00:00Z",
+            "status": "open",
+        }
+        self.assertEqual(upsert([anonymous]), (1, 0, 0))
+        closed = {**anonymous, "status": "closed"}
+        self.assertEqual(upsert([closed]), (0, 1, 0))
+        event = Event.objects.get()
+        self.assertEqual(event.status, "closed")
+        self.assertEqual(
+            event.event_time,
+            datetime(2030, 2, 1, 10, tzinfo=timezone.utc),
+        )
+
+    def test_payload_without_id_or_offset_is_not_duplicated(self):
+        anonymous = {
+            "name": "Walk-in",
+            "event_time": "2030-02-01T10:00:00",
+            "status": "open",
+        }
+        self.assertEqual(upsert([anonymous]), (1, 0, 0))
+        self.assertEqual(upsert([anonymous]), (0, 0, 1))
+        self.assertEqual(upsert([anonymous]), (0, 0, 1))
+        self.assertEqual(
+            Event.objects.get().event_time,
+            datetime(2030, 2, 1, 10, tzinfo=timezone.utc),
+        )
+
+    def test_invalid_id_is_skipped(self):
+        with self.assertLogs("syncapp.services", "WARNING"):
+            result = upsert([payload(1, id="not-a-uuid")])
+        self.assertEqual(result, (0, 0, 0))
+        self.assertFalse(Event.objects.exists())
+
+    def test_local_edit_is_overwritten_by_the_next_sync(self):
+        upsert([payload(1)])
+        event = Event.objects.get()
+        event.name = "Edited in admin"
+        event.save()
+
+        self.assertEqual(upsert([payload(1)]), (0, 1, 0))
+        event.refresh_from_db()
+        self.assertEqual(event.name, "Event 1")
+        self.assertNotEqual(event.content_hash, "")
+        self.assertEqual(upsert([payload(1)]), (0, 0, 1))
+
+    def test_local_venue_edit_is_overwritten_by_the_next_sync(self):
+        venue = {"id": str(uuid.UUID(int=99)), "name": "Hall"}
+        upsert([payload(1, venue=venue)])
+        Venue.objects.update(name="Edited in admin")
+
+        self.assertEqual(upsert([payload(1, venue=venue)]), (0, 0, 1))
+        self.assertEqual(Venue.objects.get().name, "Hall")
+
+
+class VenueResolverTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.hall = Venue.objects.create(name="Hall")
+
+    def test_prewarm_serves_known_venues_without_queries(self):
+        with self.assertNumQueries(1):
+            resolver = services.VenueResolver()
+        known = [
+            {"id": str(self.hall.id), "name": "Hall"},
+            {"id": None, "name": "Hall"},
+        ]
+        with self.assertNumQueries(0):
+            resolver.resolve(known)
+            self.assertEqual(
+                [resolver.get(v_data) for v_data in known],
+                [self.hall, self.hall],
+            )
+
+    def test_misses_are_created_and_renames_applied_in_bulk(self):
+        resolver = services.VenueResolver()
+        new_id = uuid.uuid4()
+        v_datas = [
+            {"id": str(new_id), "name": "Club"},
+            {"id": None, "name": "Park"},
+            {"id": None, "name": "Park"},
+            {"id": str(self.hall.id), "name": "Big Hall"},
+            None,
+        ]
+        # One bulk insert for both misses, one bulk update for the rename.
+        with self.assertNumQueries(2):
+            resolver.resolve(v_datas)
+        self.assertEqual(resolver.get(v_datas[0]).id, new_id)
+        self.assertEqual(resolver.get(v_datas[1]).name, "Park")
+        self.assertIsNone(resolver.get(None))
+        self.assertEqual(
+            sorted(Venue.objects.values_list("name", flat=True)),
+            ["Big Hall", "Club", "Park"],
+        )
+
+    def test_events_reference_resolved_venues(self):
+        upsert([payload(1, venue={"id": None, "name": "Park"})])
+        upsert([payload(2, venue="Park")])
+        self.assertEqual(Venue.objects.filter(name="Park").count(), 1)
+        self.assertEqual(
+            Event.objects.filter(venue__name="Park").count(),
+            2,
+        )
+
+
+def provider_events(start, stop):
+    return [payload(index) for index in range(start, stop)]
+
+
+class ProviderPagesTests(SimpleTestCase):
+    def setUp(self):
+        self.client = services.EventsProviderClient(max_retries=1)
+        self.addCleanup(self.client.close)
+
+    def provider(self, events, **options):
+        stub = ProviderStubServer(events, **options).start()
+        self.addCleanup(stub.stop)
+        return stub
+
+    def ids(self, pages):
+        return [item["id"] for page in pages for item in page["items"]]
+
+    def test_fanout_yields_pages_in_order(self):
+        events = provider_events(1, 24)
+        stub = self.provider(events)
+        # Later pages answer first.
+        stub.slow_pages = {2: 0.2, 3: 0.1}
+        pages = list(services._iter_pages(self.client, stub.url, prefetch=4))
+        self.assertEqual(self.ids(pages), [e["id"] for e in events])
+        self.assertEqual(len(stub.requests), 5)
+
+    def test_fanout_follows_next_when_the_provider_grows(self):
+        stub = self.provider(provider_events(1, 11))
+        pages = services._iter_pages(self.client, stub.url, prefetch=4)
+        first = next(pages)
+        self.assertEqual(first["count"], 10)
+        stub.events.extend(provider_events(11, 23))
+        with self.assertLogs("syncapp.services", "INFO"):
+            rest = list(pages)
+        self.assertEqual(
+            self.ids([first, *rest]),
+            [e["id"] for e in provider_events(1, 23)],
+        )
+
+    def test_prefetch_follows_next_links_without_page_numbers(self):
+        events = provider_events(1, 13)
+        stub = self.provider(events, paginate_by="offset")
+        pages = list(services._iter_pages(self.client, stub.url, prefetch=2))
+        self.assertEqual(self.ids(pages), [e["id"] for e in events])
+
+    def test_fanout_propagates_provider_errors(self):
+        stub = self.provider(provider_events(1, 21))
+        stub.fail_pages = {3: 404}
+        with self.assertLogs("syncapp.services", "ERROR"):
+            with self.assertRaises(requests.HTTPError):
+                list(services._iter_pages(self.client, stub.url, prefetch=4))
+
+
+class EventsProviderClientTests(SimpleTestCase):
+    def setUp(self):
+        self.stub = ProviderStubServer(provider_events(1, 4)).start()
+        self.addCleanup(self.stub.stop)
+
+    def fetch(self, max_retries=3):
+        with services.EventsProviderClient(max_retries=max_retries) as client:
+            return services._fetch_page(client, self.stub.url)
+
+    def test_retries_server_errors(self):
+        self.stub.responses = [503]
+        self.assertEqual(len(self.fetch()["items"]), 3)
+        self.assertEqual(len(self.stub.requests), 2)
+
+    def test_retries_dropped_connections(self):
+        self.stub.responses = [None]
+        self.assertEqual(len(self.fetch()["items"]), 3)
+        self.assertEqual(len(self.stub.requests), 2)
+
+    def test_gives_up_after_max_retries(self):
+        self.stub.responses = [500, 502]
+        with self.assertLogs("syncapp.services", "ERROR"):
+            with self.assertRaises(requests.HTTPError):
+                self.fetch(max_retries=2)
+        self.assertEqual(len(self.stub.requests), 2)
+
+    def test_client_errors_are_not_retried(self):
+        self.stub.responses = [404]
+        with self.assertLogs("syncapp.services", "ERROR"):
+            with self.assertRaises(requests.HTTPError):
+                self.fetch()
+        self.assertEqual(len(self.stub.requests), 1)
+
+
+class SyncResumeTests(TestCase):
+    def setUp(self):
+        self.stub = ProviderStubServer(provider_events(1, 13)).start()
+        self.addCleanup(self.stub.stop)
+
+    def sync(self, *args):
+        call_command(
+            "sync_events",
+            *args,
+            provider_url=self.stub.url,
+            batch_size=2,
+            prefetch_pages=0,
+            stdout=StringIO(),
+        )
+
+    def test_resume_continues_from_the_checkpoint(self):
+        self.stub.fail_pages = {2: 404}
+        with self.assertLogs("syncapp", "ERROR"):
+            with self.assertRaises(CommandError):
+                self.sync("--all")
+        sync = SyncResult.objects.get()
+        self.assertFalse(sync.completed)
+        self.assertEqual(sync.checkpoint_url, self.stub.url)
+        self.assertEqual(sync.checkpoint_offset, 4)
+        self.assertEqual(Event.objects.count(), 4)
+
+        self.stub.fail_pages = {}
+        self.stub.requests.clear()
+        self.sync("--resume")
+
+        sync.refresh_from_db()
+        self.assertTrue(sync.completed)
+        self.assertEqual((sync.processed, sync.added), (12, 12))
+        self.assertEqual(sync.checkpoint_url, "")
+        self.assertEqual(Event.objects.count(), 12)
+        # Page 1 again for its fifth item, then the rest.
+        self.assertEqual(len(self.stub.requests), 3)
+
+    def test_resume_without_failed_sync_fails(self):
+        self.sync("--all")
+        with self.assertRaisesMessage(CommandError, "no failed sync"):
+            self.sync("--resume")
+
+    def test_resume_skips_failures_superseded_by_a_later_sync(self):
+        SyncResult.objects.create(
+            finished_at=datetime(2030, 1, 1, tzinfo=timezone.utc),
+            raw_response_summary="failed: provider down",
+        )
+        self.sync("--all")
+        with self.assertRaisesMessage(CommandError, "no failed sync"):
+            self.sync("--resume")
+
+    def test_resume_refuses_while_a_sync_is_running(self):
+        SyncResult.objects.create(
+            finished_at=datetime(2030, 1, 1, tzinfo=timezone.utc),
+            raw_response_summary="failed: provider down",
+        )
+        running = SyncResult.objects.create()
+        with self.assertRaisesMessage(
+            CommandError,
+            f"Sync {running.pk} is still running",
+        ):
+            self.sync("--resume")
+        self.assertEqual(self.stub.requests, [])
+
+    def test_events_version_is_bumped_only_when_something_changed(self):
+        bump = "syncapp.management.commands.sync_events.bump_events_version"
+        with mock.patch(bump) as bump_events_version:
+            self.sync("--all")
+        # One bump per chunk of two new events.
+        self.assertEqual(bump_events_version.call_count, 6)
+
+        with mock.patch(bump) as bump_events_version:
+            self.sync("--all")
+        bump_events_version.assert_not_called()
+        self.assertEqual(SyncResult.objects.first().skipped_unchanged, 12)
+
+
+class StreamedResponse:
+    def __init__(self, body: bytes, chunk_size: int):
+        self.body = body
+        self.chunk_size = chunk_size
+        self.closed = False
+
+    def iter_content(self, chunk_size=None):
+        for start in range(0, len(self.body), self.chunk_size):
+            yield self.body[start:start + self.chunk_size]
+
+    def close(self):
+        self.closed = True
+
+
+class JsonStreamTests(SimpleTestCase):
+    items = [
+        {
+            "id": 1,
+            "name": 'Ёлка "quoted" \\ ☃ \U0001F3B8',
+            "tags": [[1, [2.5e3, -0.25]], [], {"a": [None, True]}],
+        },
+        {"id": 22, "name": "", "nested": {"deep": [[[["x"]]]]}},
+        12345,
+        "tail",
+    ]
+
+    def stream(self, document, chunk_size, ensure_ascii=False):
+        body = json.dumps(document, ensure_ascii=ensure_ascii).encode()
+        page = {"next": None, "count": None}
+        resp = StreamedResponse(body, chunk_size)
+        return list(services._iter_streamed_items(resp, page)), page, resp
+
+    def test_items_survive_every_chunk_boundary(self):
+        # Raw UTF-8 splits multibyte characters between chunks; ASCII
+        # output splits \u escapes and surrogate pairs instead.
+        for ensure_ascii in (False, True):
+            body = json.dumps(self.items, ensure_ascii=ensure_ascii).encode()
+            for chunk_size in range(1, len(body) + 1):
+                with self.subTest(
+                    ensure_ascii=ensure_ascii,
+                    chunk_size=chunk_size,
+                ):
+                    items, _, resp = self.stream(
+                        self.items,
+                        chunk_size,
+                        ensure_ascii,
+                    )
+                    self.assertEqual(items, self.items)
+                    self.assertTrue(resp.closed)
+
+    def test_results_object_fills_next_and_count(self):
+        document = {
+            "next": "http://provider/?page=2",
+            "results": self.items,
+            "previous": None,
+            "count": 40,
+        }
+        for chunk_size in (1, 3, 7, 4096):
+            with self.subTest(chunk_size=chunk_size):
+                items, page, _ = self.stream(document, chunk_size)
+                self.assertEqual(items, self.items)
+                self.assertEqual(page["next"], "http://provider/?page=2")
+                self.assertEqual(page["count"], 40)
+
+    def test_first_list_value_shape(self):
+        items, page, _ = self.stream({"meta": {}, "data": self.items}, 5)
+        self.assertEqual(items, self.items)
+        self.assertIsNone(page["next"])
+
+    def test_empty_and_whitespace_documents(self):
+        self.assertEqual(self.stream([], 1)[0], [])
+        reader = services._JsonStream([b" \n[ ", b" 1 ,\t2", b"]  "])
+        self.assertEqual(list(reader.array()), [1, 2])
+
+    def test_malformed_documents_raise(self):
+        for body in (b'"text"', b"[1 2]", b'{"results": [1,', b"[1, 2"):
+            with self.subTest(body=body):
+                with self.assertRaises(ValueError):
+                    list(services._iter_streamed_items(
+                        StreamedResponse(body, 2),
+                        {"next": None, "count": None},
+                    ))